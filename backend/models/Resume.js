@@ -2,8 +2,11 @@ const mongoose = require('mongoose');
 
 const resumeSchema = new mongoose.Schema({
   filename: String,
-  jobCode: String,
-  fileData: Buffer,  // 🔥 This field is CRUCIAL
+  jobCode: { type: String, index: true },
+  fileId: mongoose.Schema.Types.ObjectId,  // PDF stored in the "resumeFiles" GridFS bucket
+  contentHash: String,  // SHA-256 of the PDF bytes, shared by identical uploads
+  fileSize: Number,
+  fileData: Buffer,  // Legacy inline PDF, moved to GridFS by fastapi/resume_files.py
   contentType: String,
   uploadDate: {
     type: Date,
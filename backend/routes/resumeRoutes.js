@@ -6,6 +6,44 @@ const path = require("path");
 const Resume = require("../models/Resume");
 
 const Buffer = require("buffer").Buffer;
+const crypto = require("crypto");
+const mongoose = require("mongoose");
+
+// Resume PDFs live in GridFS; identical files are stored once, keyed by their SHA-256
+const RESUME_BUCKET = "resumeFiles";
+
+function resumeBucket() {
+  return new mongoose.mongo.GridFSBucket(mongoose.connection.db, { bucketName: RESUME_BUCKET });
+}
+
+async function storeResumeFile(pdfBuffer, filename) {
+  const contentHash = crypto.createHash("sha256").update(pdfBuffer).digest("hex");
+  const existing = await mongoose.connection.db
+    .collection(`${RESUME_BUCKET}.files`)
+    .findOne({ "metadata.contentHash": contentHash }, { projection: { _id: 1 } });
+  if (existing) {
+    return { fileId: existing._id, contentHash };
+  }
+
+  const upload = resumeBucket().openUploadStream(filename || `${contentHash}.pdf`, {
+    metadata: { contentHash, contentType: "application/pdf" },
+  });
+  await new Promise((resolve, reject) => {
+    upload.on("finish", resolve);
+    upload.on("error", reject);
+    upload.end(pdfBuffer);
+  });
+  return { fileId: upload.id, contentHash };
+}
+
+// Tell the matcher about a new upload. Only needed when MongoDB has no change streams
+// (not a replica set); set FASTAPI_URL to enable. Failures never affect the upload.
+function notifyMatcher(resumeId) {
+  const fastapiUrl = process.env.FASTAPI_URL;
+  if (!fastapiUrl) return;
+  fetch(`${fastapiUrl.replace(/\/$/, "")}/auto-match/resumes/${resumeId}`, { method: "POST" })
+    .catch((err) => console.error("Error notifying matcher:", err.message));
+}
 
 // POST endpoint to store base64 PDF into MongoDB
 const storage = multer.memoryStorage();
@@ -22,14 +60,19 @@ router.post("/uploadResume", async (req, res) => {
     const base64String = fileData.$binary.base64;
     const pdfBuffer = Buffer.from(base64String, "base64");
 
+    const { fileId, contentHash } = await storeResumeFile(pdfBuffer, filename);
+
     const resume = new Resume({
       filename,
       jobCode,
-      fileData: pdfBuffer, // make sure your schema uses `file: Buffer`
+      fileId,
+      contentHash,
+      fileSize: pdfBuffer.length,
       contentType: "application/pdf"
     });
 
     await resume.save();
+    notifyMatcher(resume._id);
     res.status(201).json({ message: "Resume saved successfully" });
   } catch (err) {
     console.error("Error saving resume:", err);
@@ -42,8 +85,36 @@ router.post("/uploadResume", async (req, res) => {
 router.get("/", async (req, res) => {
   console.log("Query params:", req.query);  // 👈 debug
   const { code } = req.query;
-  const resumes = await Resume.find({ jobCode: code });
+  const resumes = await Resume.find({ jobCode: code }).select("-fileData");
   res.json(resumes);
 });
 
+// Stream one resume's PDF from GridFS (or its legacy inline copy)
+router.get("/:id/file", async (req, res) => {
+  try {
+    const resume = await Resume.findById(req.params.id);
+    if (!resume) {
+      return res.status(404).json({ error: "Resume not found" });
+    }
+
+    res.set("Content-Type", resume.contentType || "application/pdf");
+    res.set("Content-Disposition", `inline; filename="${resume.filename || "resume.pdf"}"`);
+    if (!resume.fileId) {
+      return res.send(resume.fileData);
+    }
+
+    resumeBucket()
+      .openDownloadStream(resume.fileId)
+      .on("error", (err) => {
+        console.error("Error streaming resume:", err);
+        if (!res.headersSent) res.status(404).json({ error: "Resume file not found" });
+        else res.end();
+      })
+      .pipe(res);
+  } catch (err) {
+    console.error("Error fetching resume file:", err);
+    res.status(500).json({ error: "Internal Server Error" });
+  }
+});
+
 module.exports = router;
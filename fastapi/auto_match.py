@@ -0,0 +1,206 @@
+import asyncio
+import os
+import threading
+
+from dotenv import load_dotenv
+from pymongo.errors import OperationFailure, PyMongoError
+
+load_dotenv()
+
+# Match new resumes (and re-match jobs whose description changed) as soon as they land in MongoDB
+AUTO_MATCH = os.getenv("AUTO_MATCH", "true").lower() in ("1", "true", "yes")
+
+# Uploads for the same job arriving within this many seconds are matched together
+AUTO_MATCH_DEBOUNCE = float(os.getenv("AUTO_MATCH_DEBOUNCE", "2"))
+
+# Job fields that feed format_jd_for_llm; changing any other field leaves every score valid
+JD_FIELDS = ("Job Title", "Required Skills", "Experience Required", "Qualifications", "Job Responsibilities")
+
+# Where the change stream's resume token is kept, so uploads made during a restart are not missed
+STATE_COLLECTION = "auto_match_state"
+
+# MongoDB error codes: change streams need a replica set; the stored token is older than the oplog
+CHANGE_STREAM_UNSUPPORTED = (40573, 40415)
+CHANGE_STREAM_HISTORY_LOST = 286
+
+
+def change_stream_pipeline():
+    """Resume inserts and job inserts/updates/replaces, without inline PDF bytes"""
+    return [
+        {"$match": {"$or": [
+            {"ns.coll": "resumes", "operationType": "insert"},
+            {"ns.coll": "jobs", "operationType": {"$in": ["insert", "update", "replace"]}},
+        ]}},
+        {"$project": {"fullDocument.fileData": 0}},
+    ]
+
+
+def jd_changed(change):
+    """Whether a jobs change event can alter the formatted job description"""
+    if change["operationType"] != "update":
+        return True
+    updated = change.get("updateDescription", {})
+    fields = list(updated.get("updatedFields", {})) + list(updated.get("removedFields", []))
+    return any(field.split(".")[0] in JD_FIELDS for field in fields)
+
+
+class AutoMatcher:
+    """Matches resumes incrementally as they are uploaded.
+
+    Events come from a MongoDB change stream (read on a background thread) or
+    from notify_resume/notify_job, for deployments without a replica set.
+    ``on_resumes(job_code, resume_ids)`` matches newly uploaded resumes of a
+    job; ``on_job_change(job_code)`` re-matches a job whose description
+    changed. Both are awaited on the event loop; bounding how many of them
+    run at once is left to the callbacks (run_match's MatchGuard).
+    """
+
+    def __init__(self, db, on_resumes, on_job_change, debounce=AUTO_MATCH_DEBOUNCE):
+        self.db = db
+        self.on_resumes = on_resumes
+        self.on_job_change = on_job_change
+        self.debounce = debounce
+        self.watching = False
+        self.counters = {"resumes": 0, "jobs": 0, "errors": 0}
+        self._loop = None
+        self._queue = None
+        self._consumer = None
+        self._pending = {}
+        self._flush_tasks = {}
+        self._tasks = set()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self, watch=True):
+        """Start consuming events; call from a running event loop"""
+        if self._consumer is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._stopped.clear()
+        self._consumer = asyncio.create_task(self._consume())
+        if watch:
+            self._thread = threading.Thread(target=self._watch, name="auto-match-watch", daemon=True)
+            self._thread.start()
+
+    async def stop(self):
+        """Stop watching and drop pending work; the next batch /match covers anything unmatched"""
+        self._stopped.set()
+        tasks = [task for task in [self._consumer, *self._tasks] if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._consumer = None
+        self._flush_tasks = {}
+        self._pending = {}
+
+    def notify_resume(self, job_code, resume_id):
+        """Queue one uploaded resume for matching against its job"""
+        self._queue.put_nowait(("resume", job_code, str(resume_id)))
+
+    def notify_job(self, job_code):
+        """Queue a re-match of every resume of a job whose description changed"""
+        self._queue.put_nowait(("job", job_code, None))
+
+    def stats(self):
+        return {
+            **self.counters,
+            "watching": self.watching,
+            "pending": sum(len(resume_ids) for resume_ids in self._pending.values()),
+        }
+
+    def _watch(self):
+        """Background thread: forward change stream events to the event loop until stopped"""
+        state = self.db[STATE_COLLECTION]
+        token = None
+        token_loaded = False
+        while not self._stopped.is_set():
+            try:
+                # Inside the retry loop: MongoDB may still be unreachable when the app starts
+                if not token_loaded:
+                    token = (state.find_one({"_id": "change_stream"}) or {}).get("token")
+                    token_loaded = True
+                with self.db.watch(change_stream_pipeline(), full_document="updateLookup",
+                                   start_after=token, max_await_time_ms=1000) as stream:
+                    self.watching = True
+                    print("✅ Auto-matching new resumes from the MongoDB change stream")
+                    while not self._stopped.is_set():
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        self._forward(change)
+                        token = stream.resume_token
+                        state.update_one({"_id": "change_stream"}, {"$set": {"token": token}}, upsert=True)
+            except OperationFailure as e:
+                self.watching = False
+                if e.code in CHANGE_STREAM_UNSUPPORTED:
+                    print("⚠️  WARNING: MongoDB has no change streams (not a replica set); "
+                          "auto-matching only runs on POST /auto-match notifications")
+                    return
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    print("⚠️  WARNING: Change stream position expired, resuming from now")
+                    token = None
+                    continue
+                print(f"❌ Change stream error: {e}")
+                self._stopped.wait(5)
+            except PyMongoError as e:
+                self.watching = False
+                if self._stopped.is_set():
+                    return
+                print(f"❌ Change stream error: {e}")
+                self._stopped.wait(5)
+            except Exception as e:
+                # e.g. a MongoDB stand-in without watch(); notifications still work
+                self.watching = False
+                print(f"⚠️  WARNING: Change stream unavailable, auto-matching only runs on notifications: {e}")
+                return
+        self.watching = False
+
+    def _forward(self, change):
+        document = change.get("fullDocument") or {}
+        job_code = document.get("jobCode")
+        if not job_code:
+            return
+        if change["ns"]["coll"] == "resumes":
+            event = ("resume", job_code, str(document["_id"]))
+        elif jd_changed(change):
+            event = ("job", job_code, None)
+        else:
+            return
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _consume(self):
+        while True:
+            kind, job_code, resume_id = await self._queue.get()
+            if kind == "job":
+                # A full re-match of the job also covers its pending uploads
+                self._pending.pop(job_code, None)
+                self.counters["jobs"] += 1
+                self._spawn(self._run(self.on_job_change(job_code), f"re-match of {job_code}"))
+                continue
+            self._pending.setdefault(job_code, set()).add(resume_id)
+            if job_code not in self._flush_tasks:
+                self._flush_tasks[job_code] = self._spawn(self._flush_later(job_code))
+
+    async def _flush_later(self, job_code):
+        await asyncio.sleep(self.debounce)
+        # Uploads arriving from here on start a new debounce window
+        self._flush_tasks.pop(job_code, None)
+        resume_ids = sorted(self._pending.pop(job_code, set()))
+        if not resume_ids:
+            return
+        self.counters["resumes"] += len(resume_ids)
+        await self._run(self.on_resumes(job_code, resume_ids), f"match of {len(resume_ids)} new resumes for {job_code}")
+
+    async def _run(self, coroutine, description):
+        try:
+            await coroutine
+        except Exception as e:
+            self.counters["errors"] += 1
+            print(f"❌ Auto {description} failed: {e}")
@@ -0,0 +1,355 @@
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import queue as queue_module
+import random
+import re
+import sys
+import time
+
+# Offline benchmark of the match pipeline: synthetic jobs and PDF resumes (in
+# GridFS, as uploads store them) in an in-memory Mongo (mongomock), answered by
+# the fake LLM backend with simulated latency and errors. Each size runs in a
+# fresh process so caches start cold; memory is reported as growth over the RSS
+# measured once the corpus is loaded.
+#
+#   pip install -r requirements-dev.txt
+#   python benchmark.py --sizes 10 100 1000 --latency 0.2 --error-rate 0.02
+
+# Seconds a child may run before the benchmark gives up on it (one size, all runs)
+CHILD_TIMEOUT = 6 * 3600
+
+SEED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "uploads")
+
+FIRST_NAMES = ["Asha", "Ben", "Chen", "Divya", "Elena", "Farid", "Grace", "Hiro", "Isla", "Jonas", "Kavya", "Luis"]
+LAST_NAMES = ["Kumar", "Smith", "Li", "Nair", "Garcia", "Haddad", "Okafor", "Tanaka", "Brown", "Meyer", "Rao"]
+JOB_TITLES = ["Backend Engineer", "Data Scientist", "ML Engineer", "Full Stack Developer", "DevOps Engineer"]
+
+# Lines in seed resumes that identify a real person are never copied into synthetic ones
+PII_PATTERN = re.compile(r"@|\+?\d[\d\s-]{8,}\d|linkedin|github", re.IGNORECASE)
+
+FALLBACK_SEED = """Experience
+Software Engineer, built REST APIs and data pipelines serving production traffic.
+Led migration of batch jobs to containerized services with automated deployments.
+Projects
+Recommendation service using embeddings and nearest-neighbour search.
+Education
+Bachelor of Engineering in Computer Science"""
+
+
+def load_seed_texts(seed_dir=SEED_DIR):
+    """Distinct text bodies of the sample PDFs, with identifying lines removed"""
+    import pymupdf
+
+    texts = {}
+    for path in sorted(glob.glob(os.path.join(seed_dir, "*.pdf"))):
+        with pymupdf.open(path) as doc:
+            text = "".join(page.get_text() for page in doc)
+        lines = [line.strip() for line in text.splitlines() if line.strip() and not PII_PATTERN.search(line)]
+        texts[hashlib.sha256(text.encode("utf-8")).hexdigest()] = "\n".join(lines)
+    return list(texts.values()) or [FALLBACK_SEED]
+
+
+def synthetic_job(rng, job_code, skills):
+    """Job document shaped like the ones the Node backend stores"""
+    return {
+        "jobCode": job_code,
+        "Job Title": rng.choice(JOB_TITLES),
+        "Required Skills": rng.sample(skills, 5),
+        "Experience Required": f"{rng.randint(0, 8)}+ years",
+        "Qualifications": ["Bachelor's degree in Computer Science or related field"],
+        "Job Responsibilities": ["Design and build services", "Review code", "Work with product teams"],
+    }
+
+
+def synthetic_resume_text(rng, index, seed_text, skills):
+    """A seed resume body under a made-up identity, with a random skill mix and line order"""
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    email = f"{name.lower().replace(' ', '.')}.{index}@example.com"
+    phone = f"+1 555 {rng.randint(1000000, 9999999)}"
+    body = seed_text.splitlines()
+    body = rng.sample(body, k=max(1, int(len(body) * rng.uniform(0.6, 1.0))))
+    header = [name, f"{email} | {phone}", f"Skills: {', '.join(rng.sample(skills, rng.randint(3, 10)))}"]
+    return "\n".join(header + body)
+
+
+def render_pdf(text):
+    """Lay text out on as many A4 pages as it needs"""
+    import pymupdf
+
+    doc = pymupdf.open()
+    lines = text.splitlines()
+    per_page = 60
+    for start in range(0, len(lines), per_page):
+        page = doc.new_page()
+        page.insert_textbox(pymupdf.Rect(50, 50, 545, 800), "\n".join(lines[start:start + per_page]), fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def percentile(values, q):
+    """q-th percentile (0-100) of a non-empty list, linear interpolation"""
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS); None on Windows"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _allow_mongomock_bulk_sort():
+    """mongomock 4.3 predates the `sort` argument newer pymongo passes for UpdateOne in bulk_write"""
+    import inspect
+
+    from mongomock.collection import BulkOperationBuilder
+
+    add_update = BulkOperationBuilder.add_update
+    if "sort" in inspect.signature(add_update).parameters:
+        return
+
+    def add_update_without_sort(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+
+    BulkOperationBuilder.add_update = add_update_without_sort
+
+
+def _allow_mongomock_gridfs():
+    """Let pymongo's GridFSBucket run on mongomock, which has no client.options (read for CSOT timeouts)"""
+    import types
+
+    import mongomock
+    import mongomock.gridfs
+
+    mongomock.gridfs.enable_gridfs_integration()
+    if "options" not in vars(mongomock.MongoClient):
+        mongomock.MongoClient.options = property(lambda self: types.SimpleNamespace(timeout=None))
+
+
+async def _match_runs(db, job, options, runs, baseline_rss):
+    """Run the pipeline `runs` times over the job's resumes; returns one result dict per run"""
+    from cache import DocumentCache
+    from llm import close_llm_client, get_llm_client
+    from match import format_jd_for_llm
+    from metrics import LLM_TOKENS, start_trace
+    from pipeline import iter_match_results
+    from resume_files import RESUME_METADATA_PROJECTION, read_resume_pdf, resume_metadata_query
+    from store import ShortlistWriter
+
+    parse_cache = DocumentCache("parse", db["parse_cache"])
+    match_cache = DocumentCache("match", db["match_cache"])
+    jd_text = format_jd_for_llm(job)
+
+    async def load_pdf(resume_doc):
+        return await asyncio.to_thread(read_resume_pdf, db, resume_doc)
+
+    def token_totals():
+        totals = {"prompt": 0, "output": 0}
+        for _, labels, value in LLM_TOKENS.samples():
+            totals[labels["direction"]] += value
+        return totals
+
+    results = []
+    for run in range(runs):
+        client = get_llm_client()
+        before = dict(client.counters)
+        tokens_before = token_totals()
+        started = time.perf_counter()
+        resumes = list(db["resumes"].find(resume_metadata_query(job["jobCode"]), RESUME_METADATA_PROJECTION))
+        mongo_load = time.perf_counter() - started
+
+        trace = {}
+        start_trace(trace)
+        writer = ShortlistWriter(db["shortlists"])
+        outcomes = {"shortlisted": 0, "rejected": 0, "failed": 0}
+        async for entry in iter_match_results(job["jobCode"], jd_text, resumes, parse_cache=parse_cache,
+                                              match_cache=match_cache, load_pdf=load_pdf,
+                                              required_skills=job["Required Skills"], **options):
+            if entry.get("candidateName") == "Processing Failed":
+                outcomes["failed"] += 1
+            else:
+                outcomes["shortlisted" if entry.get("shortlist") else "rejected"] += 1
+            if writer.add(entry):
+                writer.flush()
+        writer.flush()
+        elapsed = time.perf_counter() - started
+        start_trace(None)
+
+        peak = peak_rss_mb()
+        stages = {}
+        for resume_stages in trace.values():
+            for stage, seconds in resume_stages.items():
+                stages.setdefault(stage, []).append(seconds)
+        results.append({
+            "run": "cold" if run == 0 else f"warm{run}",
+            "resumes": len(resumes),
+            "elapsedSeconds": round(elapsed, 3),
+            "resumesPerSecond": round(len(resumes) / elapsed, 2) if elapsed > 0 else None,
+            "mongoLoadSeconds": round(mongo_load, 4),
+            "outcomes": outcomes,
+            "llm": {name: client.counters[name] - before.get(name, 0) for name in client.counters},
+            "tokens": {direction: count - tokens_before[direction] for direction, count in token_totals().items()},
+            "stages": {
+                stage: {
+                    "count": len(values),
+                    "p50": round(percentile(values, 50), 4),
+                    "p99": round(percentile(values, 99), 4),
+                }
+                for stage, values in sorted(stages.items())
+            },
+            "baselineRssMb": baseline_rss,
+            "peakRssMb": peak,
+            "matchRssMb": round(peak - baseline_rss, 1) if peak is not None else None,
+        })
+    await close_llm_client()
+    return results
+
+
+def run_size(size, args):
+    """Benchmark one corpus size in this process; returns the per-run results"""
+    import mongomock
+
+    from extract import shutdown_extract_pool
+    from fake_llm import KNOWN_SKILLS
+    from resume_files import store_resume_pdf
+
+    _allow_mongomock_bulk_sort()
+    _allow_mongomock_gridfs()
+    rng = random.Random(args["seed"])
+    seeds = load_seed_texts(args["seed_dir"])
+    db = mongomock.MongoClient()["benchmark"]
+    job = synthetic_job(rng, "BENCH001", KNOWN_SKILLS)
+    db["jobs"].insert_one(dict(job))
+
+    # Stored like the Node upload route does: PDF in GridFS, metadata document in resumes
+    started = time.perf_counter()
+    for start in range(0, size, 500):
+        docs = []
+        for index in range(start, min(size, start + 500)):
+            filename = f"resume-{index}.pdf"
+            data = render_pdf(synthetic_resume_text(rng, index, rng.choice(seeds), KNOWN_SKILLS))
+            file_id, content_hash = store_resume_pdf(db, data, filename)
+            docs.append({"jobCode": job["jobCode"], "filename": filename, "fileId": file_id,
+                         "contentHash": content_hash, "fileSize": len(data)})
+        db["resumes"].insert_many(docs)
+    print(f"📄 Generated {size} resumes in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    # The corpus itself lives in this process; memory is reported as growth over this
+    baseline_rss = peak_rss_mb()
+
+    options = {
+        "concurrency": args["concurrency"],
+        "batch_size": args["batch_size"],
+        "mode": args["mode"],
+        "top_k": args["top_k"],
+    }
+    try:
+        return asyncio.run(_match_runs(db, job, options, 2 if args["warm"] else 1, baseline_rss))
+    finally:
+        shutdown_extract_pool()
+
+
+def _run_size_in_child(size, args, queue):
+    try:
+        queue.put(("ok", run_size(size, args)))
+    except Exception as e:
+        queue.put(("error", f"{type(e).__name__}: {e}"))
+
+
+def _wait_for_child(process, queue, timeout=CHILD_TIMEOUT):
+    """(status, payload) from a benchmark child, or an error if it died (e.g. OOM-killed) or hung"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return queue.get(timeout=5)
+        except queue_module.Empty:
+            if not process.is_alive():
+                try:
+                    return queue.get(timeout=1)
+                except queue_module.Empty:
+                    return "error", f"child process exited with code {process.exitcode}"
+    process.terminate()
+    return "error", f"no result after {timeout}s"
+
+
+def print_report(size, results):
+    for result in results:
+        llm = result["llm"]
+        print(
+            f"\n{size:>6} resumes [{result['run']}]  {result['resumesPerSecond']} resumes/s  "
+            f"{result['elapsedSeconds']}s wall  RSS +{result['matchRssMb']} MB over {result['baselineRssMb']} MB  "
+            f"LLM requests {llm['requests']} (retries {llm['retries']}, failures {llm['failures']})  "
+            f"tokens in/out {result['tokens']['prompt']}/{result['tokens']['output']}  "
+            f"failed resumes {result['outcomes']['failed']}"
+        )
+        print(f"  {'stage':<18}{'count':>8}{'p50 s':>10}{'p99 s':>10}")
+        print(f"  {'mongo_load':<18}{1:>8}{result['mongoLoadSeconds']:>10}{result['mongoLoadSeconds']:>10}")
+        for stage, stats in result["stages"].items():
+            print(f"  {stage:<18}{stats['count']:>8}{stats['p50']:>10}{stats['p99']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the resume match pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000],
+                        help="Resume counts to benchmark, each in a fresh process")
+    parser.add_argument("--mode", choices=["full", "prefilter", "single_pass"], default="full")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--top-k", type=int, default=20, help="Candidates sent to the LLM in prefilter mode")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mean fake LLM latency per request (seconds)")
+    parser.add_argument("--token-latency", type=float, default=0.0,
+                        help="Extra fake LLM latency per output token (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of LLM requests answered with 503")
+    parser.add_argument("--rate-limit", type=float, default=1000.0, help="LLM requests/second allowed by the client")
+    parser.add_argument("--warm", action="store_true", help="Repeat each run once the caches are filled")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--seed-dir", default=SEED_DIR, help="Directory of sample PDFs used as resume bodies")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    # Spawned children read these at import time
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "LLM_RATE_LIMIT": str(args.rate_limit),
+        "LLM_BURST": str(max(1, int(args.rate_limit))),
+        "FAKE_LLM_LATENCY": str(args.latency),
+        "FAKE_LLM_TOKEN_LATENCY": str(args.token_latency),
+        "FAKE_LLM_ERROR_RATE": str(args.error_rate),
+        "FAKE_LLM_SEED": str(args.seed),
+    })
+    child_args = {key: value for key, value in vars(args).items() if key != "json_path"}
+
+    context = multiprocessing.get_context("spawn")
+    report = {"config": child_args, "results": {}}
+    for size in args.sizes:
+        queue = context.Queue()
+        process = context.Process(target=_run_size_in_child, args=(size, child_args, queue))
+        process.start()
+        status, payload = _wait_for_child(process, queue)
+        process.join()
+        if status != "ok":
+            print(f"❌ Benchmark of {size} resumes failed: {payload}")
+            continue
+        report["results"][str(size)] = payload
+        print_report(size, payload)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
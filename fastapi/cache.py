@@ -0,0 +1,159 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from pymongo.errors import OperationFailure, PyMongoError
+
+load_dotenv()
+
+# Defaults for the parsed-resume cache
+PARSE_CACHE_MAX_ENTRIES = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "1000"))
+PARSE_CACHE_TTL_SECONDS = int(os.getenv("PARSE_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+# Defaults for the match-result cache
+MATCH_CACHE_MAX_ENTRIES = int(os.getenv("MATCH_CACHE_MAX_ENTRIES", "5000"))
+MATCH_CACHE_TTL_SECONDS = int(os.getenv("MATCH_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# The TTL index exists with another expireAfterSeconds: IndexOptionsConflict / IndexKeySpecsConflict
+INDEX_CONFLICT_ERRORS = (85, 86)
+
+
+def content_hash(*parts):
+    """Stable SHA-256 hex digest over bytes/str parts"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(bytes(part))
+        # Separator so ("ab", "c") and ("a", "bc") hash differently
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class DocumentCache:
+    """Two-tier cache: an in-process LRU in front of a Mongo collection with a TTL index.
+
+    Keys are content hashes, values are JSON-like dicts. Either tier can be
+    disabled: pass ``collection=None`` for a memory-only cache.
+    """
+
+    def __init__(self, name, collection=None, max_entries=1000, ttl_seconds=30 * 24 * 3600):
+        self.name = name
+        self.collection = collection
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._indexes_ready = False
+        self.counters = {"hits": 0, "memory_hits": 0, "store_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def _ensure_indexes(self):
+        """Create the TTL index on first use rather than at import time.
+
+        A changed TTL is applied to the existing index with collMod. Index
+        errors are logged, never raised: the cache works without the index,
+        entries just stop expiring on their own.
+        """
+        if self._indexes_ready or self.collection is None:
+            return
+        self._indexes_ready = True
+        try:
+            self.collection.create_index("lastAccessed", expireAfterSeconds=self.ttl_seconds)
+        except OperationFailure as e:
+            if e.code not in INDEX_CONFLICT_ERRORS:
+                print(f"⚠️  WARNING: Could not create the {self.name} cache TTL index: {e}")
+                return
+            try:
+                self.collection.database.command(
+                    "collMod", self.collection.name,
+                    index={"keyPattern": {"lastAccessed": 1}, "expireAfterSeconds": self.ttl_seconds},
+                )
+                print(f"✅ {self.name} cache TTL changed to {self.ttl_seconds}s")
+            except PyMongoError as e:
+                print(f"⚠️  WARNING: Could not change the {self.name} cache TTL index: {e}")
+        except PyMongoError as e:
+            # e.g. MongoDB unreachable: try again on the next lookup
+            self._indexes_ready = False
+            print(f"⚠️  WARNING: Could not create the {self.name} cache TTL index: {e}")
+
+    def _remember(self, key, value):
+        """Insert into the in-memory LRU, evicting the oldest entries"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                value, stored_at = item
+                if time.monotonic() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    self.counters["memory_hits"] += 1
+                    return value
+                del self._entries[key]
+
+        if self.collection is not None:
+            self._ensure_indexes()
+            doc = self.collection.find_one_and_update(
+                {"_id": key, "lastAccessed": {"$gte": datetime.utcnow() - timedelta(seconds=self.ttl_seconds)}},
+                {"$set": {"lastAccessed": datetime.utcnow()}, "$inc": {"hits": 1}},
+            )
+            if doc is not None:
+                self._remember(key, doc["value"])
+                with self._lock:
+                    self.counters["hits"] += 1
+                    self.counters["store_hits"] += 1
+                return doc["value"]
+
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def peek(self, key):
+        """Return the cached value for key without counting a hit or refreshing its TTL"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and time.monotonic() - item[1] <= self.ttl_seconds:
+                return item[0]
+
+        if self.collection is not None:
+            doc = self.collection.find_one(
+                {"_id": key, "lastAccessed": {"$gte": datetime.utcnow() - timedelta(seconds=self.ttl_seconds)}},
+                {"value": 1},
+            )
+            if doc is not None:
+                return doc["value"]
+        return None
+
+    def set(self, key, value):
+        """Store value under key in both tiers"""
+        self._remember(key, value)
+        if self.collection is not None:
+            self._ensure_indexes()
+            now = datetime.utcnow()
+            self.collection.update_one(
+                {"_id": key},
+                {"$set": {"value": value, "lastAccessed": now}, "$setOnInsert": {"createdAt": now, "hits": 0}},
+                upsert=True,
+            )
+        with self._lock:
+            self.counters["writes"] += 1
+
+    def stats(self):
+        """Snapshot of the hit/miss counters"""
+        with self._lock:
+            counters = dict(self.counters)
+            counters["size"] = len(self._entries)
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = round(counters["hits"] / lookups, 4) if lookups else 0.0
+        return {"name": self.name, **counters}
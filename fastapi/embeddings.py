@@ -0,0 +1,121 @@
+import os
+import zlib
+
+import httpx
+import numpy as np
+from dotenv import load_dotenv
+
+from llm import GEMINI_API_KEY, GEMINI_BASE_URL, HEADERS, LLM_TIMEOUT, OLLAMA_URL
+from ranker import tokenize
+
+load_dotenv()
+
+# Which provider turns resume/JD text into vectors: "hashing" (local, no model download), "gemini" or "ollama"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "hashing").lower()
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
+
+# Width of the local hashing vectors
+HASHING_DIMENSIONS = int(os.getenv("HASHING_DIMENSIONS", "1024"))
+
+# Texts sent per embedding request to a remote provider
+EMBEDDING_BATCH_SIZE = 64
+
+# Labels added by format_resume_for_llm / format_jd_for_llm and filler words; they say nothing about fit
+HASHING_STOPWORDS = {
+    "name", "email", "phone", "contact", "n", "a", "skills", "education", "work", "experience", "certifications",
+    "job", "title", "required", "qualifications", "responsibilities", "in", "at", "and", "or", "the", "of", "to",
+    "for", "with", "on",
+}
+
+
+def normalize_rows(vectors):
+    """L2-normalize each row so a dot product is the cosine similarity"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class HashingEmbedder:
+    """Local signed feature-hashing of word unigrams and bigrams, log-scaled term frequencies"""
+
+    name = "hashing"
+
+    def __init__(self, dimensions=HASHING_DIMENSIONS):
+        self.dimensions = dimensions
+        self.model = f"hashing-{dimensions}"
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = [token for token in tokenize(text) if token not in HASHING_STOPWORDS]
+            features = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+            for feature in features:
+                # crc32 is stable across processes, unlike hash()
+                digest = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                vectors[row, digest % self.dimensions] += sign
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        return normalize_rows(vectors)
+
+
+class GeminiEmbedder:
+    """Gemini batchEmbedContents API"""
+
+    name = "gemini"
+
+    def __init__(self, model=None, api_key=GEMINI_API_KEY, base_url=GEMINI_BASE_URL):
+        self.model = model or "text-embedding-004"
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+
+    def embed(self, texts):
+        url = f"{self.base_url}/models/{self.model}:batchEmbedContents"
+        vectors = []
+        with httpx.Client(timeout=LLM_TIMEOUT, headers=HEADERS) as client:
+            for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+                payload = {"requests": [
+                    {"model": f"models/{self.model}", "content": {"parts": [{"text": text}]}}
+                    for text in texts[start:start + EMBEDDING_BATCH_SIZE]
+                ]}
+                response = client.post(url, params={"key": self.api_key}, json=payload)
+                response.raise_for_status()
+                vectors.extend(item["values"] for item in response.json()["embeddings"])
+        return normalize_rows(vectors)
+
+
+class OllamaEmbedder:
+    """Local models served by Ollama's /api/embed endpoint"""
+
+    name = "ollama"
+
+    def __init__(self, model=None, base_url=OLLAMA_URL):
+        self.model = model or "nomic-embed-text"
+        self.base_url = base_url.rstrip("/")
+
+    def embed(self, texts):
+        vectors = []
+        with httpx.Client(timeout=LLM_TIMEOUT, headers=HEADERS) as client:
+            for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+                payload = {"model": self.model, "input": texts[start:start + EMBEDDING_BATCH_SIZE]}
+                response = client.post(f"{self.base_url}/api/embed", json=payload)
+                response.raise_for_status()
+                vectors.extend(response.json()["embeddings"])
+        return normalize_rows(vectors)
+
+
+EMBEDDERS = {
+    "hashing": HashingEmbedder,
+    "gemini": GeminiEmbedder,
+    "ollama": OllamaEmbedder,
+}
+
+
+def get_embedder():
+    """Build the embedder selected by EMBEDDING_BACKEND"""
+    embedder_class = EMBEDDERS.get(EMBEDDING_BACKEND)
+    if embedder_class is None:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{EMBEDDING_BACKEND}', expected one of {', '.join(EMBEDDERS)}")
+    if embedder_class is HashingEmbedder:
+        return HashingEmbedder()
+    return embedder_class(model=EMBEDDING_MODEL)
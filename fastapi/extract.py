@@ -0,0 +1,101 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz  # PyMuPDF
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Characters of raw resume text read from a PDF; extraction stops once it has this many.
+# prompt_budget.compact_resume_text then fits it to PARSE_TOKEN_BUDGET for the prompt.
+PARSE_TEXT_BUDGET = int(os.getenv("PARSE_TEXT_BUDGET", "12000"))
+
+# Worker processes for PDF extraction (0 runs extraction in a thread instead)
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_extract_pool = None
+
+
+def extract_text(file_bytes: bytes, max_chars=PARSE_TEXT_BUDGET):
+    """Extract up to max_chars of text from a PDF, stopping at the first page past the budget.
+
+    Returns (text, stats) where stats has the pages read, total pages, character
+    count, whether the text was cut at the budget, and the time taken.
+    """
+    started = time.perf_counter()
+    parts = []
+    chars = 0
+    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+        total_pages = doc.page_count
+        pages_read = 0
+        for page in doc:
+            page_text = page.get_text()
+            parts.append(page_text)
+            chars += len(page_text)
+            pages_read += 1
+            if max_chars and chars >= max_chars:
+                break
+
+    text = "".join(parts)
+    truncated = bool(max_chars) and len(text) > max_chars
+    if truncated:
+        text = text[:max_chars]
+
+    stats = {
+        "pages": pages_read,
+        "totalPages": total_pages,
+        "chars": len(text),
+        "truncated": truncated or pages_read < total_pages,
+        "seconds": round(time.perf_counter() - started, 4),
+    }
+    return text, stats
+
+
+def get_extract_pool():
+    """Return the shared process pool for extraction, or None when running in threads"""
+    global _extract_pool
+    if PDF_EXTRACT_WORKERS <= 0:
+        return None
+    if _extract_pool is None:
+        # Spawned, not forked: the parent already runs pymongo and asyncio threads
+        _extract_pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+    return _extract_pool
+
+
+def shutdown_extract_pool():
+    """Stop the extraction worker processes"""
+    global _extract_pool
+    if _extract_pool is not None:
+        _extract_pool.shutdown(wait=False, cancel_futures=True)
+        _extract_pool = None
+
+
+async def extract_text_async(file_bytes: bytes, max_chars=PARSE_TEXT_BUDGET):
+    """Run extract_text in the process pool so PyMuPDF work stays off the event loop"""
+    global _extract_pool
+    loop = asyncio.get_running_loop()
+    pool = get_extract_pool()
+    if pool is not None:
+        try:
+            text, stats = await loop.run_in_executor(pool, extract_text, file_bytes, max_chars)
+        except BrokenProcessPool:
+            # A crashed worker poisons the pool; start a fresh one for later documents
+            print("⚠️  WARNING: PDF extraction pool broke, retrying in a thread")
+            # Concurrent callers see the same broken pool; only the first one replaces it
+            if _extract_pool is pool:
+                _extract_pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+            text, stats = await asyncio.to_thread(extract_text, file_bytes, max_chars)
+    else:
+        text, stats = await asyncio.to_thread(extract_text, file_bytes, max_chars)
+
+    print(
+        f"📄 Extracted {stats['chars']} chars from {stats['pages']}/{stats['totalPages']} pages "
+        f"in {stats['seconds'] * 1000:.1f} ms"
+    )
+    return text, stats
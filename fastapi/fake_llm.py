@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+import random
+import re
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Simulated backend behaviour, used by benchmark.py: mean seconds per request,
+# extra seconds per output token, and the share of requests answered with HTTP 503
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0"))
+FAKE_LLM_TOKEN_LATENCY = float(os.getenv("FAKE_LLM_TOKEN_LATENCY", "0"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_SEED = os.getenv("FAKE_LLM_SEED")
+
+# Skills the fake recognises when "parsing" resume text
+KNOWN_SKILLS = [
+    "Python", "Java", "JavaScript", "TypeScript", "C++", "Go", "SQL", "MongoDB", "React", "Node.js",
+    "FastAPI", "Django", "Docker", "Kubernetes", "AWS", "Azure", "GCP", "Machine Learning",
+    "Deep Learning", "NLP", "TensorFlow", "PyTorch", "Pandas", "NumPy", "Git", "Linux", "Excel",
+]
+
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+PHONE_PATTERN = re.compile(r"\+?\d[\d\s-]{8,}\d")
+
+
+def _skills_in(text):
+    lowered = text.lower()
+    return [skill for skill in KNOWN_SKILLS if re.search(rf"(?<![\w+#]){re.escape(skill.lower())}(?![\w+#])", lowered)]
+
+
+def fake_parse(resume_text):
+    """Deterministic stand-in for the resume parse prompt"""
+    lines = [line.strip() for line in resume_text.splitlines() if line.strip()]
+    email = EMAIL_PATTERN.search(resume_text)
+    phone = PHONE_PATTERN.search(resume_text)
+    return {
+        "Full Name": lines[0] if lines else "N/A",
+        "Contact Information": {
+            "email": email.group(0) if email else "N/A",
+            "phone": phone.group(0).strip() if phone else "N/A",
+        },
+        "Skills": _skills_in(resume_text),
+        "Education": [],
+        "Work Experience": [],
+        "Certifications": [],
+    }
+
+
+def fake_match(jd_text, resume_text):
+    """Deterministic stand-in for the match prompt: score is required-skill coverage"""
+    required_line = next((line for line in jd_text.splitlines() if line.startswith("Required Skills:")), "")
+    required = [skill.strip() for skill in required_line.partition(":")[2].split(",") if skill.strip()]
+    have = {skill.lower() for skill in _skills_in(resume_text)}
+    matched = [skill for skill in required if skill.lower() in have]
+    missing = [skill for skill in required if skill.lower() not in have]
+    score = round(100 * len(matched) / len(required)) if required else 50
+    return {
+        "match_score": score,
+        "matched_skills": matched,
+        "missing_skills": missing,
+        "summary": f"Covers {len(matched)} of {len(required)} required skills.",
+        "shortlist": score >= 60,
+    }
+
+
+def fake_generate(prompt):
+    """Answer any pipeline prompt with deterministic JSON text"""
+    if '"profile":' in prompt:
+        jd_text, _, resume_text = prompt.split("Job Description:", 1)[1].partition("Resume Text:")
+        return json.dumps({"profile": fake_parse(resume_text), "match": fake_match(jd_text, resume_text)})
+
+    if "Resume Text:" in prompt:
+        return json.dumps(fake_parse(prompt.split("Resume Text:", 1)[1]))
+
+    jd_text = prompt.split("Job Description:", 1)[-1]
+    if "### Candidate" in prompt:
+        jd_text, _, candidates = jd_text.partition("Candidates:")
+        blocks = re.split(r"### Candidate (\d+)\n", candidates)[1:]
+        results = []
+        for candidate_id, resume_text in zip(blocks[::2], blocks[1::2]):
+            results.append({"candidate_id": int(candidate_id), **fake_match(jd_text, resume_text)})
+        return json.dumps(results)
+
+    jd_text, _, resume_text = jd_text.partition("Candidate Resume:")
+    return json.dumps(fake_match(jd_text, resume_text))
+
+
+def handle_request(request: httpx.Request):
+    """httpx transport handler speaking the Gemini generateContent protocol"""
+    body = json.loads(request.content)
+    prompt = "".join(part.get("text", "") for part in body["contents"][0]["parts"])
+    text = fake_generate(prompt)
+    return httpx.Response(200, json={
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}],
+        # Rough ~4 characters per token, like prompt_budget.estimate_tokens
+        "usageMetadata": {"promptTokenCount": len(prompt) // 4 + 1, "candidatesTokenCount": len(text) // 4 + 1},
+    })
+
+
+class FakeLLMTransport(httpx.MockTransport):
+    """handle_request behind a simulated network: jittered latency and random 503s.
+
+    Latency is uniform in [0.5, 1.5] x FAKE_LLM_LATENCY plus FAKE_LLM_TOKEN_LATENCY
+    per output token, so longer replies (and bigger batches) take longer.
+    """
+
+    def __init__(self, latency=FAKE_LLM_LATENCY, token_latency=FAKE_LLM_TOKEN_LATENCY,
+                 error_rate=FAKE_LLM_ERROR_RATE, seed=FAKE_LLM_SEED):
+        super().__init__(handle_request)
+        self.latency = latency
+        self.token_latency = token_latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+
+    def _simulate(self, request):
+        """Return (delay, response) for one request"""
+        if self.error_rate and self.rng.random() < self.error_rate:
+            return self.latency * self.rng.uniform(0.5, 1.5), httpx.Response(503, json={"error": "overloaded"})
+        response = handle_request(request)
+        output_tokens = response.json()["usageMetadata"]["candidatesTokenCount"]
+        return self.latency * self.rng.uniform(0.5, 1.5) + self.token_latency * output_tokens, response
+
+    def handle_request(self, request):
+        request.read()
+        delay, response = self._simulate(request)
+        time.sleep(delay)
+        return response
+
+    async def handle_async_request(self, request):
+        await request.aread()
+        delay, response = self._simulate(request)
+        await asyncio.sleep(delay)
+        return response
@@ -0,0 +1,362 @@
+import asyncio
+import os
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+from metrics import ERRORS, LLM_BYTES, LLM_TOKENS
+from resilience import (
+    LLM_HEDGE_AFTER,
+    LLM_MAX_RETRIES,
+    AdaptiveRateLimiter,
+    CircuitBreaker,
+    backoff_delay,
+    parse_retry_after,
+)
+
+load_dotenv()
+
+# Which backend serves LLM calls: "gemini", "ollama" or "fake" (deterministic, offline)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1")
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+
+DEFAULT_MODELS = {
+    "gemini": "gemini-2.5-pro",
+    "ollama": "llama3.1",
+    "fake": "fake",
+}
+
+# Model per pipeline stage, so parsing can run on a cheaper model than matching
+PARSE_MODEL = os.getenv("PARSE_MODEL", DEFAULT_MODELS.get(LLM_BACKEND, "gemini-2.5-pro"))
+MATCH_MODEL = os.getenv("MATCH_MODEL", DEFAULT_MODELS.get(LLM_BACKEND, "gemini-2.5-pro"))
+STAGE_MODELS = {"parse": PARSE_MODEL, "match": MATCH_MODEL}
+
+# Connection pool size shared by the sync and async clients
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+
+# Ask the backend for JSON-only output (Gemini responseMimeType / Ollama format); every prompt expects JSON
+LLM_JSON_MODE = os.getenv("LLM_JSON_MODE", "true").lower() in ("1", "true", "yes")
+
+HEADERS = {
+    "Content-Type": "application/json"
+}
+
+
+# HTTP statuses worth retrying; anything else in 4xx is a caller/config problem
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Raised when an LLM backend cannot be reached or answers with an HTTP error"""
+
+
+class GeminiBackend:
+    """Google Gemini generateContent API"""
+
+    name = "gemini"
+
+    def __init__(self, api_key=GEMINI_API_KEY, base_url=GEMINI_BASE_URL, json_mode=LLM_JSON_MODE):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.json_mode = json_mode
+
+    def is_configured(self):
+        return bool(self.api_key)
+
+    def build_request(self, prompt, model, temperature, max_output_tokens):
+        url = f"{self.base_url}/models/{model}:generateContent"
+        payload = {
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": {
+                "temperature": temperature,
+                "maxOutputTokens": max_output_tokens
+            }
+        }
+        if self.json_mode:
+            payload["generationConfig"]["responseMimeType"] = "application/json"
+        return url, {"key": self.api_key}, payload
+
+    def transport(self):
+        """Custom httpx transport, or None for real network I/O"""
+        return None
+
+    def response_text(self, response_data):
+        return response_data.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "").strip()
+
+    def usage(self, response_data):
+        """(prompt_tokens, output_tokens) reported by the API"""
+        usage = response_data.get("usageMetadata", {})
+        return usage.get("promptTokenCount", 0), usage.get("candidatesTokenCount", 0)
+
+
+class OllamaBackend:
+    """Local models served by Ollama's /api/generate endpoint"""
+
+    name = "ollama"
+
+    def __init__(self, base_url=OLLAMA_URL, json_mode=LLM_JSON_MODE):
+        self.base_url = base_url.rstrip("/")
+        self.json_mode = json_mode
+
+    def is_configured(self):
+        return True
+
+    def build_request(self, prompt, model, temperature, max_output_tokens):
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+            "options": {"temperature": temperature, "num_predict": max_output_tokens},
+        }
+        if self.json_mode:
+            payload["format"] = "json"
+        return f"{self.base_url}/api/generate", None, payload
+
+    def transport(self):
+        return None
+
+    def response_text(self, response_data):
+        return response_data.get("response", "").strip()
+
+    def usage(self, response_data):
+        return response_data.get("prompt_eval_count", 0), response_data.get("eval_count", 0)
+
+
+class FakeBackend(GeminiBackend):
+    """Gemini-shaped backend answered in-process by fake_llm, for tests and offline benchmarks"""
+
+    name = "fake"
+
+    def __init__(self):
+        super().__init__(api_key="fake", base_url="http://fake-llm/v1")
+
+    def transport(self):
+        from fake_llm import FakeLLMTransport
+        return FakeLLMTransport()
+
+
+BACKENDS = {
+    "gemini": GeminiBackend,
+    "ollama": OllamaBackend,
+    "fake": FakeBackend,
+}
+
+
+class LLMClient:
+    """One LLM client for every pipeline stage, with pooled keep-alive connections.
+
+    ``generate`` is for sync callers and reuses an httpx.Client;
+    ``agenerate`` is for the async pipeline and reuses an httpx.AsyncClient.
+    Every call goes through a shared adaptive rate limiter, retries 429/5xx and
+    network errors with jittered backoff, and trips a circuit breaker when the
+    backend keeps failing (raising resilience.CircuitOpenError).
+    """
+
+    def __init__(self, backend, stage_models=None, timeout=LLM_TIMEOUT, max_connections=LLM_MAX_CONNECTIONS,
+                 max_retries=LLM_MAX_RETRIES, hedge_after=LLM_HEDGE_AFTER, limiter=None, breaker=None):
+        self.backend = backend
+        self.stage_models = {**STAGE_MODELS, **(stage_models or {})}
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.counters = {"requests": 0, "retries": 0, "throttled": 0, "hedged": 0, "failures": 0}
+        self._sync_client = None
+        self._async_client = None
+
+    def model_for(self, stage):
+        """Model configured for a pipeline stage ("parse" or "match")"""
+        return self.stage_models[stage]
+
+    def is_configured(self):
+        return self.backend.is_configured()
+
+    def stats(self):
+        """Request counters plus limiter and circuit breaker state"""
+        return {
+            **self.counters,
+            "rate_limit": round(self.limiter.rate, 3),
+            "circuit_state": self.breaker.state,
+            "circuit_opened": self.breaker.times_opened,
+        }
+
+    def _limits(self):
+        return httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+
+    def _get_sync_client(self):
+        if self._sync_client is None or self._sync_client.is_closed:
+            self._sync_client = httpx.Client(
+                limits=self._limits(), timeout=self.timeout, headers=HEADERS, transport=self.backend.transport()
+            )
+        return self._sync_client
+
+    def _get_async_client(self):
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(
+                limits=self._limits(), timeout=self.timeout, headers=HEADERS, transport=self.backend.transport()
+            )
+        return self._async_client
+
+    def _read_response(self, stage, response):
+        """Decode a successful response, recording its token and byte counts"""
+        response_data = response.json()
+        prompt_tokens, output_tokens = self.backend.usage(response_data)
+        LLM_TOKENS.inc(prompt_tokens, stage=stage, direction="prompt")
+        LLM_TOKENS.inc(output_tokens, stage=stage, direction="output")
+        LLM_BYTES.inc(len(response.request.content), stage=stage, direction="sent")
+        LLM_BYTES.inc(len(response.content), stage=stage, direction="received")
+        return self.backend.response_text(response_data)
+
+    def _record_failure(self, stage, error):
+        """Count a request that is given up on"""
+        self.counters["failures"] += 1
+        ERRORS.inc(stage=f"llm_{stage}", type=type(error).__name__)
+
+    def _check_response(self, response):
+        """Classify a response: return the retry delay hint for retryable failures, raise for fatal ones"""
+        if response.status_code < 400:
+            return None
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if response.status_code == 429:
+            self.counters["throttled"] += 1
+            self.limiter.on_throttled(retry_after)
+        if response.status_code in RETRYABLE_STATUSES:
+            return retry_after or 0.0
+        self.breaker.record_failure()
+        raise LLMError(f"{self.backend.name} request failed with HTTP {response.status_code}: {response.text[:200]}")
+
+    async def _post_hedged(self, url, params, payload, timeout):
+        """POST once; if no answer within hedge_after seconds, race a duplicate request"""
+        client = self._get_async_client()
+
+        async def hedge():
+            # The duplicate is a request like any other: it waits for the rate limiter and is counted
+            await self.limiter.acquire()
+            self.counters["requests"] += 1
+            return await client.post(url, params=params, json=payload, timeout=timeout)
+
+        first = asyncio.ensure_future(client.post(url, params=params, json=payload, timeout=timeout))
+        if not self.hedge_after:
+            return await first
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done:
+            return first.result()
+
+        self.counters["hedged"] += 1
+        pending = {first, asyncio.ensure_future(hedge())}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Both attempts failed; surface the first one's error
+            return first.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def generate(self, prompt, stage, max_output_tokens=1000, temperature=0.3, timeout=None):
+        """Send one prompt synchronously and return the model's text"""
+        url, params, payload = self.backend.build_request(
+            prompt, self.model_for(stage), temperature, max_output_tokens
+        )
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            self.breaker.check_sync()
+            self.limiter.acquire_sync()
+            self.counters["requests"] += 1
+            retry_after = None
+            try:
+                response = self._get_sync_client().post(
+                    url, params=params, json=payload, timeout=timeout or self.timeout
+                )
+                retry_after = self._check_response(response)
+                if retry_after is None:
+                    self.breaker.record_success()
+                    self.limiter.on_success()
+                    return self._read_response(stage, response)
+                last_error = LLMError(f"{self.backend.name} request failed with HTTP {response.status_code}")
+            except httpx.TransportError as e:
+                last_error = LLMError(f"{self.backend.name} request failed: {e}")
+            except LLMError as e:
+                # Non-retryable status (bad key, rejected request): fail now, but count it
+                self._record_failure(stage, e)
+                raise
+            self.breaker.record_failure()
+            if attempt < self.max_retries:
+                self.counters["retries"] += 1
+                time.sleep(backoff_delay(attempt, retry_after))
+        self._record_failure(stage, last_error)
+        raise last_error
+
+    async def agenerate(self, prompt, stage, max_output_tokens=1000, temperature=0.3, timeout=None):
+        """Send one prompt over the shared async client and return the model's text"""
+        url, params, payload = self.backend.build_request(
+            prompt, self.model_for(stage), temperature, max_output_tokens
+        )
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            # Pauses (rather than fails) while the backend is known to be down
+            await self.breaker.wait_until_closed()
+            await self.limiter.acquire()
+            self.counters["requests"] += 1
+            retry_after = None
+            try:
+                response = await self._post_hedged(url, params, payload, timeout or self.timeout)
+                retry_after = self._check_response(response)
+                if retry_after is None:
+                    self.breaker.record_success()
+                    self.limiter.on_success()
+                    return self._read_response(stage, response)
+                last_error = LLMError(f"{self.backend.name} request failed with HTTP {response.status_code}")
+            except httpx.TransportError as e:
+                last_error = LLMError(f"{self.backend.name} request failed: {e}")
+            except LLMError as e:
+                # Non-retryable status (bad key, rejected request): fail now, but count it
+                self._record_failure(stage, e)
+                raise
+            self.breaker.record_failure()
+            if attempt < self.max_retries:
+                self.counters["retries"] += 1
+                await asyncio.sleep(backoff_delay(attempt, retry_after))
+        self._record_failure(stage, last_error)
+        raise last_error
+
+    async def aclose(self):
+        """Close pooled connections"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+
+_llm_client = None
+
+
+def get_llm_client():
+    """Return the process-wide LLM client for the configured backend"""
+    global _llm_client
+    if _llm_client is None:
+        backend_class = BACKENDS.get(LLM_BACKEND)
+        if backend_class is None:
+            raise ValueError(f"Unknown LLM_BACKEND '{LLM_BACKEND}', expected one of {', '.join(BACKENDS)}")
+        _llm_client = LLMClient(backend_class())
+    return _llm_client
+
+
+async def close_llm_client():
+    """Close the process-wide LLM client if it was ever created"""
+    global _llm_client
+    if _llm_client is not None:
+        await _llm_client.aclose()
+        _llm_client = None
@@ -0,0 +1,104 @@
+import json
+
+CLOSERS = {"{": "}", "[": "]"}
+
+
+def _scan_balanced(text, start):
+    """Scan one JSON value starting at an opening brace/bracket.
+
+    Strings and escapes are respected, // comments are dropped, and trailing
+    commas before a closer are removed. Returns (end, cleaned) where cleaned is
+    None if the braces do not balance.
+    """
+    stack = []
+    out = []
+    in_string = False
+    escaped = False
+    i = start
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch == "/" and text.startswith("//", i):
+            # Models sometimes echo the annotated schema from the prompt
+            newline = text.find("\n", i)
+            i = n if newline == -1 else newline
+            continue
+        elif ch in CLOSERS:
+            stack.append(CLOSERS[ch])
+            out.append(ch)
+        elif ch in "}]":
+            if not stack or ch != stack.pop():
+                return i, None
+            last = len(out) - 1
+            while last >= 0 and out[last].isspace():
+                last -= 1
+            if last >= 0 and out[last] == ",":
+                del out[last]
+            out.append(ch)
+            if not stack:
+                return i, "".join(out)
+        else:
+            out.append(ch)
+        i += 1
+    return n, None
+
+
+def extract_json(text, openers="{["):
+    """Return the first JSON value in text that starts with one of openers.
+
+    Handles code fences, surrounding prose, nested objects, // comments and
+    trailing commas in a single left-to-right scan: after a candidate fails,
+    scanning resumes after it, and a candidate still open at the end of the
+    text (a reply cut off at the token limit) ends the search. Raises
+    ValueError if no valid JSON value is found.
+    """
+    stripped = text.strip()
+    if stripped[:1] in openers:
+        try:
+            return json.loads(stripped)
+        except json.JSONDecodeError:
+            pass
+
+    # Next index of each opener at or after position; -1 once there are none left
+    next_start = {opener: text.find(opener) for opener in openers}
+    position = 0
+    while True:
+        for opener, index in next_start.items():
+            if index != -1 and index < position:
+                next_start[opener] = text.find(opener, position)
+        starts = [index for index in next_start.values() if index != -1]
+        if not starts:
+            break
+        start = min(starts)
+        end, candidate = _scan_balanced(text, start)
+        if candidate is not None:
+            try:
+                return json.loads(candidate)
+            except json.JSONDecodeError:
+                pass
+        elif end >= len(text):
+            # Still unbalanced at the end: no later opener can close either
+            break
+        position = end + 1
+    raise ValueError("Could not extract valid JSON from response")
+
+
+def extract_json_object(text):
+    """First JSON object in an LLM reply"""
+    return extract_json(text, "{")
+
+
+def extract_json_array(text):
+    """First JSON array in an LLM reply (e.g. a batch of match results)"""
+    return extract_json(text, "[")
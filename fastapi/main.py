@@ -1,37 +1,142 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pymongo import MongoClient
 from bson import ObjectId
-from datetime import datetime
+import asyncio
+import json
 import os
+import time
+from contextlib import asynccontextmanager
+from typing import Literal
 from dotenv import load_dotenv
 from pymongo.server_api import ServerApi
 # Import your modules
-from match import smart_match, format_jd_for_llm, format_resume_for_llm
-from parser import parse_resume_with_llm_binary
+from auto_match import AUTO_MATCH, AutoMatcher
+from match import MATCH_BATCH_SIZE, format_jd_for_llm
+from ranker import PREFILTER_MIN_SCORE, PREFILTER_TOP_K
+from cache import (
+    DocumentCache,
+    MATCH_CACHE_MAX_ENTRIES,
+    MATCH_CACHE_TTL_SECONDS,
+    PARSE_CACHE_MAX_ENTRIES,
+    PARSE_CACHE_TTL_SECONDS,
+)
+from extract import shutdown_extract_pool
+from llm import LLM_BACKEND, close_llm_client, get_llm_client
+from metrics import REGISTRY, RESUMES, stage_timer, start_trace, summarize_trace
+from pipeline import MATCH_CONCURRENCY, iter_match_results
+from resilience import CircuitOpenError
+from resume_files import RESUME_METADATA_PROJECTION, read_resume_pdf, resume_metadata_query
+from runs import MATCH_WORKERS, MatchGuard, MatchRunQueue
+from search import format_hit, index_documents
+from vector_index import get_embedding_index
+from store import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    ShortlistWriter,
+    ensure_indexes,
+    find_page_by_id,
+    find_page_by_score,
+    parse_fields,
+)
 
 load_dotenv()
 
-app = FastAPI(title="AI Recruiter API", version="1.0.0")
-
 # Environment validation
 MONGO_URL = os.getenv("MONGO_URL")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Validate required environment variables
-if not MONGO_URL:
-    print("❌ ERROR: MONGO_URL environment variable is not set!")
-    raise ValueError("MONGO_URL environment variable is required")
+# Seconds /ready waits for a MongoDB ping before reporting the service as not ready
+READINESS_TIMEOUT = float(os.getenv("READINESS_TIMEOUT", "2"))
+
+# MongoDB handles, set by connect_mongo() when the app starts; nothing touches the database at import
+client = None
+db = None
+resume_collection = None
+job_collection = None
+shortlist_collection = None
+parse_cache = None
+match_cache = None
+# Background index creation, so a slow or unreachable MongoDB does not hold up startup
+index_task = None
+# Matches uploads as they arrive (AUTO_MATCH); None when disabled
+auto_matcher = None
+
+def validate_environment():
+    """Fail fast when required settings are missing"""
+    if not MONGO_URL:
+        print("❌ ERROR: MONGO_URL environment variable is not set!")
+        raise ValueError("MONGO_URL environment variable is required")
 
-if not GEMINI_API_KEY:
-    print("❌ ERROR: GEMINI_API_KEY environment variable is not set!")
-    raise ValueError("GEMINI_API_KEY environment variable is required")
+    if LLM_BACKEND == "gemini" and not GEMINI_API_KEY:
+        print("❌ ERROR: GEMINI_API_KEY environment variable is not set!")
+        raise ValueError("GEMINI_API_KEY environment variable is required for LLM_BACKEND=gemini")
 
-print("✅ Environment variables validated successfully")
-print(f"✅ MONGO_URL configured: {MONGO_URL[:20]}...")
-print(f"✅ GEMINI_API_KEY configured: {'*' * len(GEMINI_API_KEY) if GEMINI_API_KEY else 'NOT SET'}")
+    print("✅ Environment variables validated successfully")
+    print(f"✅ MONGO_URL configured: {MONGO_URL[:20]}...")
+    print(f"✅ GEMINI_API_KEY configured: {'*' * len(GEMINI_API_KEY) if GEMINI_API_KEY else 'NOT SET'}")
+    print(f"✅ LLM backend: {LLM_BACKEND}")
+
+def connect_mongo():
+    """Create the MongoDB client and caches; the first query opens the connection"""
+    global client, db, resume_collection, job_collection, shortlist_collection, parse_cache, match_cache
+    client = MongoClient(MONGO_URL, connect=False)
+    db = client["test"]
+    resume_collection = db["resumes"]
+    job_collection = db["jobs"]
+    shortlist_collection = db["shortlists"]
+    # Parsed resumes keyed by PDF hash + parse model/prompt version
+    parse_cache = DocumentCache(
+        "parse",
+        db["parse_cache"],
+        max_entries=PARSE_CACHE_MAX_ENTRIES,
+        ttl_seconds=PARSE_CACHE_TTL_SECONDS,
+    )
+    # Match results keyed by JD/resume fingerprints + match model/prompt version/threshold
+    match_cache = DocumentCache(
+        "match",
+        db["match_cache"],
+        max_entries=MATCH_CACHE_MAX_ENTRIES,
+        ttl_seconds=MATCH_CACHE_TTL_SECONDS,
+    )
+    print(f"✅ MongoDB client configured for database: {db.name}")
+
+async def create_indexes():
+    try:
+        await run_in_threadpool(ensure_indexes, db)
+        print("✅ MongoDB indexes are in place")
+    except Exception as e:
+        print(f"⚠️  WARNING: could not create MongoDB indexes: {e}")
+
+@asynccontextmanager
+async def lifespan(app):
+    """Connect lazily and start the match workers; stop workers and release clients on shutdown"""
+    global index_task, auto_matcher
+    validate_environment()
+    # MongoClient resolves mongodb+srv hosts in its constructor, keep that off the event loop
+    await run_in_threadpool(connect_mongo)
+    index_task = asyncio.create_task(create_indexes())
+    match_runs.start()
+    if AUTO_MATCH:
+        auto_matcher = AutoMatcher(db, auto_match_resumes, auto_match_resumes)
+        auto_matcher.start()
+    try:
+        yield
+    finally:
+        if auto_matcher is not None:
+            await auto_matcher.stop()
+        await match_runs.stop()
+        await close_llm_client()
+        shutdown_extract_pool()
+        if index_task is not None and not index_task.done():
+            index_task.cancel()
+        if client is not None:
+            client.close()
+
+app = FastAPI(title="AI Recruiter API", version="1.0.0", lifespan=lifespan)
 
 # CORS configuration
 app.add_middleware(
@@ -42,14 +147,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# MongoDB setup
-client = MongoClient(MONGO_URL)
-db = client["test"]
-resume_collection = db["resumes"]
-job_collection = db["jobs"]
-shortlist_collection = db["shortlists"]
-print(f"✅ MongoDB connected to database: {db.name}")
-
 def serialize_doc(doc):
     """Convert MongoDB document to JSON serializable format"""
     if doc and "_id" in doc:
@@ -64,141 +161,461 @@ def serialize_docs(docs):
 async def root():
     return {"message": "AI Recruiter API is running"}
 
+@app.get("/health")
+async def health():
+    """Liveness: the process is up and serving requests (no I/O)"""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: MongoDB answers a ping; also reports LLM, index and worker state"""
+    checks = {}
+    try:
+        await asyncio.wait_for(run_in_threadpool(client.admin.command, "ping"), READINESS_TIMEOUT)
+        checks["mongo"] = "ok"
+    except Exception as e:
+        checks["mongo"] = f"error: {type(e).__name__}"
+    llm_client = get_llm_client()
+    checks["llm"] = "ok" if llm_client.is_configured() else "not configured"
+    checks["llm_circuit"] = llm_client.stats()["circuit_state"]
+    checks["indexes"] = "pending" if index_task is not None and not index_task.done() else "done"
+    checks["match_workers"] = match_runs.live_workers
+
+    ready = checks["mongo"] == "ok" and checks["llm"] == "ok"
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, "checks": checks})
+
+def match_options(
+    concurrency: int = Query(MATCH_CONCURRENCY, ge=1, le=64),
+    batch_size: int = Query(MATCH_BATCH_SIZE, ge=1, le=50),
+    mode: Literal["full", "prefilter", "single_pass"] = "full",
+    top_k: int = Query(PREFILTER_TOP_K, ge=1),
+    min_local_score: float = Query(PREFILTER_MIN_SCORE, ge=0.0, le=1.0),
+    trace: bool = False,
+):
+    """Query parameters shared by the match endpoints"""
+    return {
+        "concurrency": concurrency,
+        "batch_size": batch_size,
+        "mode": mode,
+        "top_k": top_k,
+        "min_local_score": min_local_score,
+        "trace": trace,
+    }
+
+async def load_job(job_code):
+    """Fetch a job and its formatted description, or raise 404"""
+    with stage_timer("mongo_load"):
+        job = await run_in_threadpool(job_collection.find_one, {"jobCode": job_code})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job, format_jd_for_llm(job)
+
+async def load_resumes(job_code, resume_ids=None):
+    """Metadata of a job's resumes that have a file; PDFs are fetched later, one per worker slot"""
+    query = resume_metadata_query(job_code)
+    if resume_ids is not None:
+        query["_id"] = {"$in": [ObjectId(resume_id) if ObjectId.is_valid(resume_id) else resume_id
+                                for resume_id in resume_ids]}
+    with stage_timer("mongo_load"):
+        return await run_in_threadpool(
+            lambda: list(resume_collection.find(query, RESUME_METADATA_PROJECTION))
+        )
+
+async def load_pdf(resume_doc):
+    """Fetch one resume's PDF bytes from GridFS (or its legacy inline fileData)"""
+    return await run_in_threadpool(read_resume_pdf, db, resume_doc)
+
+def entry_outcome(entry):
+    """Outcome label of a shortlist entry: failed, shortlisted or rejected"""
+    if entry.get("candidateName") == "Processing Failed":
+        return "failed"
+    return "shortlisted" if entry.get("shortlist") else "rejected"
+
+def trace_report(trace):
+    """Per-resume stage timings of a traced run plus per-stage totals"""
+    return {"stages": summarize_trace(trace), "resumes": trace}
+
+async def run_match(job_code, job, jd_text, resumes, options, trace=None):
+    """Match resumes for a job, store each shortlist entry and yield it as soon as it is ready.
+
+    Waits while another match of the same job is in progress, or while
+    MATCH_WORKERS matches are already running.
+    When a trace dict is given, it is filled with {resume_id: {stage: seconds}}.
+    """
+    options = {key: value for key, value in options.items() if key != "trace"}
+    # Tasks spawned by the pipeline inherit this, so their stage timings land in the trace
+    start_trace(trace)
+    writer = ShortlistWriter(shortlist_collection)
+    async with match_guard.hold(job_code):
+        try:
+            # Resumes are processed concurrently; entries arrive in completion order
+            async for entry in iter_match_results(job_code, jd_text, resumes,
+                                                  parse_cache=parse_cache, match_cache=match_cache,
+                                                  load_pdf=load_pdf,
+                                                  required_skills=job.get("Required Skills", []), **options):
+                RESUMES.inc(outcome=entry_outcome(entry))
+                # Upsert into shortlist collection, one bulk_write per batch of entries
+                if writer.add(entry):
+                    with stage_timer("shortlist_write"):
+                        await run_in_threadpool(writer.flush)
+                yield entry
+        finally:
+            with stage_timer("shortlist_write"):
+                await run_in_threadpool(writer.flush)
+    await index_match_run(job, resumes)
+
+async def index_match_run(job, resumes):
+    """Add the job and the resumes parsed during a match run to the embedding index"""
+    try:
+        embedded = await run_in_threadpool(index_documents, get_embedding_index(), parse_cache, [job], resumes)
+        print(f"✅ Embedded {embedded} new or changed documents for {job.get('jobCode')}")
+    except Exception as e:
+        print(f"⚠️  WARNING: could not update the embedding index: {e}")
+
+async def execute_match_run(run):
+    """Worker body for a queued match run: match every resume and record progress"""
+    job, jd_text = await load_job(run.job_code)
+    resumes = await load_resumes(run.job_code)
+    run.total = len(resumes)
+    async for entry in run_match(run.job_code, job, jd_text, resumes, run.options, trace=run.trace):
+        run.record(entry)
+
+# Background match runs, at most one active run per job code
+match_runs = MatchRunQueue(execute_match_run, workers=MATCH_WORKERS)
+
+# Held by every match (queued, wait=true, streamed, auto): one at a time per job, MATCH_WORKERS overall
+match_guard = MatchGuard(MATCH_WORKERS)
+
+def default_match_options():
+    """The /match query defaults, used when matching is triggered by an upload"""
+    return {
+        "concurrency": MATCH_CONCURRENCY,
+        "batch_size": MATCH_BATCH_SIZE,
+        "mode": "full",
+        "top_k": PREFILTER_TOP_K,
+        "min_local_score": PREFILTER_MIN_SCORE,
+    }
+
+async def auto_match_resumes(job_code, resume_ids=None):
+    """Match a job's newly uploaded resumes, or all of them after its description changed.
+
+    Results land in the shortlist and the parse/match caches, so a later
+    /match for the job only has cache hits left. Like every other match it
+    waits behind a running match of the same job and counts toward MATCH_WORKERS.
+    """
+    job, jd_text = await load_job(job_code)
+    resumes = await load_resumes(job_code, resume_ids)
+    matched = 0
+    async for _ in run_match(job_code, job, jd_text, resumes, default_match_options()):
+        matched += 1
+    print(f"✅ Auto-matched {matched} resumes for {job_code}")
+
 @app.post("/match/{job_code}")
-async def match_job(job_code: str):
-    """Match candidates with a specific job"""
+async def match_job(job_code: str, options: dict = Depends(match_options), wait: bool = False):
+    """Match candidates with a specific job.
+
+    By default the run is queued and its id returned straight away; poll
+    /match/runs/{run_id} for progress. Pass wait=true to block until every
+    resume is matched and get the results in the response.
+    """
     try:
-        # Find job by job code
-        job = job_collection.find_one({"jobCode": job_code})
-        print(job)
-        if not job:
-            raise HTTPException(status_code=404, detail="Job not found")
-
-        # Format job description
-        jd_text = format_jd_for_llm(job)
-        
+        job, jd_text = await load_job(job_code)
+
+        if not wait:
+            run, created = match_runs.submit(job_code, options)
+            return JSONResponse(
+                status_code=202 if created else 200,
+                content=jsonable_encoder({**run.to_dict(), "created": created}),
+            )
+
         # Get all resumes for this job
-        resumes = list(resume_collection.find({"jobCode": job_code}))
+        resumes = await load_resumes(job_code)
         
         if not resumes:
             return {"results": [], "message": "No resumes found for this job"}
 
-        results = []
-        
-        for resume_doc in resumes:
-            try:
-                # Get binary data
-                binary_data = resume_doc.get("fileData")
-                if not binary_data:
-                    print(f"❌ No file data found for resume {resume_doc.get('_id')}")
-                    continue
-                
-                print(f"🔄 Processing resume {resume_doc.get('_id')}...")
-                
-                # Parse resume
-                resume_data = parse_resume_with_llm_binary(binary_data)
-                print(f"✅ Resume parsed successfully: {resume_data.get('Full Name', 'N/A')}")
-                
-                resume_text = format_resume_for_llm(resume_data)
-
-                # Perform matching
-                print(f"🔄 Performing smart match...")
-                match = smart_match(jd_text, resume_text, threshold=60)
-                print(f"✅ Match completed with score: {match.get('match_score', 0)}")
-
-                # Create shortlist entry
-                entry = {
-                    "candidateName": resume_data.get("Full Name", "N/A"),
-                    "email": resume_data.get("Contact Information", {}).get("email", "N/A") if isinstance(resume_data.get("Contact Information"), dict) else "N/A",
-                    "resumeId": str(resume_doc["_id"]),
-                    "jobCode": job_code,
-                    "score": match.get("match_score", 0),
-                    "matchedSkills": match.get("matched_skills", []),
-                    "missingSkills": match.get("missing_skills", []),
-                    "summary": match.get("summary", "Could not generate summary."),
-                    "shortlist": match.get("shortlist", False),
-                    "dateShortlisted": datetime.utcnow()
-                }
-
-                # Insert into shortlist collection
-                inserted = shortlist_collection.insert_one(entry)
-                entry["_id"] = str(inserted.inserted_id)
-                
-                results.append(entry)
-                
-            except Exception as e:
-                print(f"❌ Error processing resume {resume_doc.get('_id')}: {e}")
-                print(f"❌ Error type: {type(e).__name__}")
-                # Create a default entry for failed resumes to help with debugging
-                failed_entry = {
-                    "candidateName": "Processing Failed",
-                    "email": "N/A",
-                    "resumeId": str(resume_doc["_id"]),
-                    "jobCode": job_code,
-                    "score": 0,
-                    "matchedSkills": [],
-                    "missingSkills": [],
-                    "summary": f"Processing failed: {str(e)}",
-                    "shortlist": False,
-                    "dateShortlisted": datetime.utcnow()
-                }
-                
-                # Insert failed entry for debugging
-                inserted = shortlist_collection.insert_one(failed_entry)
-                failed_entry["_id"] = str(inserted.inserted_id)
-                results.append(failed_entry)
-                continue
-
-        return jsonable_encoder({"results": results, "total": len(results)})
+        trace = {} if options["trace"] else None
+        results = [entry async for entry in run_match(job_code, job, jd_text, resumes, options, trace=trace)]
+
+        response = {"results": results, "total": len(results)}
+        if trace is not None:
+            response["trace"] = trace_report(trace)
+        return jsonable_encoder(response)
         
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        print(f"Error in match_job: {e}")
+        raise HTTPException(status_code=503, detail=f"LLM backend unavailable: {str(e)}")
     except Exception as e:
         print(f"Error in match_job: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.get("/match/runs")
+async def list_match_runs(job_code: str = None):
+    """List queued, running and recently finished match runs"""
+    return jsonable_encoder({"runs": [run.to_dict() for run in match_runs.list(job_code)]})
+
+@app.get("/match/runs/{run_id}")
+async def get_match_run(run_id: str):
+    """Progress of a match run (done/failed/total, throughput)"""
+    run = match_runs.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Match run not found")
+    return jsonable_encoder(run.to_dict())
+
+@app.get("/match/runs/{run_id}/trace")
+async def get_match_run_trace(run_id: str):
+    """Stage timings of each resume in a run submitted with trace=true, slowest stage first"""
+    run = match_runs.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Match run not found")
+    if run.trace is None:
+        raise HTTPException(status_code=404, detail="Run was not traced; submit it with trace=true")
+    return {"runId": run.id, "status": run.status, **trace_report(run.trace)}
+
+@app.post("/match/runs/{run_id}/cancel")
+async def cancel_match_run(run_id: str):
+    """Cancel a queued or running match run"""
+    run = match_runs.cancel(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Match run not found")
+    return jsonable_encoder(run.to_dict())
+
+@app.post("/match/{job_code}/stream")
+async def match_job_stream(
+    job_code: str,
+    options: dict = Depends(match_options),
+    format: Literal["ndjson", "sse"] = "ndjson",
+):
+    """Match candidates with a job, streaming each shortlist entry as it completes.
+
+    Every frame is {"type": "result", "data": entry}; the last one is
+    {"type": "summary", ...} (or {"type": "error", ...} if the run aborted).
+    """
+    job, jd_text = await load_job(job_code)
+
+    def frame(payload):
+        body = json.dumps(jsonable_encoder(payload))
+        if format == "sse":
+            return f"event: {payload['type']}\ndata: {body}\n\n"
+        return body + "\n"
+
+    async def frames():
+        started = time.perf_counter()
+        total = shortlisted = failed = 0
+        trace = {} if options["trace"] else None
+        try:
+            resumes = await load_resumes(job_code)
+            async for entry in run_match(job_code, job, jd_text, resumes, options, trace=trace):
+                total += 1
+                shortlisted += bool(entry.get("shortlist"))
+                failed += entry.get("candidateName") == "Processing Failed"
+                yield frame({"type": "result", "data": entry})
+        except Exception as e:
+            print(f"Error in match_job_stream: {e}")
+            yield frame({"type": "error", "detail": f"Internal server error: {str(e)}"})
+            return
+        summary = {
+            "type": "summary",
+            "jobCode": job_code,
+            "total": total,
+            "shortlisted": shortlisted,
+            "failed": failed,
+            "elapsedSeconds": round(time.perf_counter() - started, 3),
+        }
+        if trace is not None:
+            summary["trace"] = trace_report(trace)
+        yield frame(summary)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(frames(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
 @app.get("/shortlist/{job_code}")
-async def get_shortlist(job_code: str):
-    """Get shortlisted candidates for a job"""
+async def get_shortlist(
+    job_code: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str = None,
+    fields: str = None,
+    min_score: int = Query(None, ge=0, le=100),
+    shortlist: bool = None,
+):
+    """Get candidates for a job, best score first, one page at a time.
+
+    Pass the returned nextCursor as `after` to fetch the next page.
+    """
     try:
+        query = {"jobCode": job_code}
+        if min_score is not None:
+            query["score"] = {"$gte": min_score}
+        if shortlist is not None:
+            query["shortlist"] = shortlist
+
         # Get shortlisted candidates
-        data = list(shortlist_collection.find({"jobCode": job_code}))
+        data, next_cursor = await run_in_threadpool(
+            find_page_by_score, shortlist_collection, query, limit, after,
+            parse_fields(fields, always=("_id", "score"))
+        )
         
         # Serialize documents
         serialized_data = serialize_docs(data)
         
         return jsonable_encoder({
             "shortlist": serialized_data,
-            "total": len(serialized_data)
+            "count": len(serialized_data),
+            "nextCursor": next_cursor
         })
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error in get_shortlist: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+def require_auto_matcher():
+    if auto_matcher is None:
+        raise HTTPException(status_code=409, detail="Auto-matching is disabled (AUTO_MATCH=false)")
+    return auto_matcher
+
+@app.post("/auto-match/resumes/{resume_id}", status_code=202)
+async def notify_resume_uploaded(resume_id: str):
+    """Queue a freshly uploaded resume for matching (for MongoDB deployments without change streams)"""
+    matcher = require_auto_matcher()
+    resume = await run_in_threadpool(
+        resume_collection.find_one,
+        {"_id": ObjectId(resume_id) if ObjectId.is_valid(resume_id) else resume_id}, {"jobCode": 1}
+    )
+    if not resume or not resume.get("jobCode"):
+        raise HTTPException(status_code=404, detail="Resume not found")
+    matcher.notify_resume(resume["jobCode"], resume_id)
+    return {"queued": True, "resumeId": resume_id, "jobCode": resume["jobCode"]}
+
+@app.post("/auto-match/jobs/{job_code}", status_code=202)
+async def notify_job_updated(job_code: str):
+    """Queue a re-match of a job's resumes after its description changed"""
+    require_auto_matcher().notify_job(job_code)
+    return {"queued": True, "jobCode": job_code}
+
+@app.get("/auto-match/stats")
+async def get_auto_match_stats():
+    """Whether the change stream is being watched, and how many uploads were matched or are pending"""
+    return require_auto_matcher().stats()
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters for the LLM result caches"""
+    return {"caches": [parse_cache.stats(), match_cache.stats()]}
+
+def collect_runtime_metrics():
+    """Gauges read at scrape time from the caches, the LLM client and the run queue"""
+    caches = [parse_cache.stats(), match_cache.stats()]
+    yield ("smartmatch_cache_hits_total", "counter", "LLM result cache hits",
+           [({"cache": stats["name"]}, stats["hits"]) for stats in caches])
+    yield ("smartmatch_cache_misses_total", "counter", "LLM result cache misses",
+           [({"cache": stats["name"]}, stats["misses"]) for stats in caches])
+    yield ("smartmatch_cache_hit_ratio", "gauge", "LLM result cache hit rate since start",
+           [({"cache": stats["name"]}, stats["hit_rate"]) for stats in caches])
+    yield ("smartmatch_cache_entries", "gauge", "Entries held in the in-process cache tier",
+           [({"cache": stats["name"]}, stats["size"]) for stats in caches])
+
+    llm_stats = get_llm_client().stats()
+    yield ("smartmatch_llm_events_total", "counter", "LLM client requests, retries, hedges and failures",
+           [({"event": name}, value) for name, value in llm_stats.items()
+            if name not in ("rate_limit", "circuit_state", "circuit_opened")])
+    yield ("smartmatch_llm_rate_limit", "gauge", "Current adaptive LLM request rate (requests/second)",
+           [({}, llm_stats["rate_limit"])])
+    yield ("smartmatch_llm_circuit_open", "gauge", "1 while the LLM circuit breaker is not closed",
+           [({"state": llm_stats["circuit_state"]}, int(llm_stats["circuit_state"] != "closed"))])
+    yield ("smartmatch_llm_circuit_opened_total", "counter", "Times the LLM circuit breaker opened",
+           [({}, llm_stats["circuit_opened"])])
+
+    statuses = {}
+    for run in match_runs.list():
+        statuses[run.status] = statuses.get(run.status, 0) + 1
+    yield ("smartmatch_match_runs", "gauge", "Known match runs by status",
+           [({"status": status}, count) for status, count in statuses.items()])
+
+REGISTRY.add_collector(collect_runtime_metrics)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of stage timings, LLM usage, cache and error counters"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/search/jobs/{job_code}/candidates")
+async def search_candidates_for_job(job_code: str, k: int = Query(20, ge=1, le=500), other_jobs_only: bool = False):
+    """Top-K resumes across all jobs for a JD, by embedding similarity (no LLM call)"""
+    index = get_embedding_index()
+    vector = await run_in_threadpool(index.vector, "job", job_code)
+    if vector is None:
+        job, _ = await load_job(job_code)
+        await run_in_threadpool(index_documents, index, parse_cache, [job])
+        vector = await run_in_threadpool(index.vector, "job", job_code)
+    hits = await run_in_threadpool(index.search, vector, "resume", k, None, job_code if other_jobs_only else None)
+    return {"jobCode": job_code, "candidates": [format_hit(entry, similarity) for entry, similarity in hits]}
+
+@app.get("/search/resumes/{resume_id}/similar")
+async def search_similar_candidates(resume_id: str, k: int = Query(10, ge=1, le=500)):
+    """Candidates whose resumes are closest to the given one, across all jobs"""
+    index = get_embedding_index()
+    vector = await run_in_threadpool(index.vector, "resume", resume_id)
+    if vector is None:
+        raise HTTPException(status_code=404, detail="Resume is not indexed yet; run a match for its job first")
+    hits = await run_in_threadpool(index.search, vector, "resume", k, ("resume", resume_id))
+    return {"resumeId": resume_id, "candidates": [format_hit(entry, similarity) for entry, similarity in hits]}
+
+@app.post("/search/reindex")
+async def reindex_embeddings():
+    """Embed every job and every resume that already has a cached parse"""
+    def reindex():
+        jobs = job_collection.find()
+        # Migrated resumes carry contentHash; only legacy ones still bring their inline PDF
+        resumes = resume_collection.find({}, {"fileData": 1, "jobCode": 1, "contentHash": 1})
+        return index_documents(get_embedding_index(), parse_cache, jobs, resumes)
+
+    embedded = await run_in_threadpool(reindex)
+    return {"embedded": embedded, "index": get_embedding_index().stats()}
+
+@app.get("/search/stats")
+async def get_search_stats():
+    """Size and embedder of the embedding index"""
+    return get_embedding_index().stats()
+
 @app.get("/jobs")
-async def get_jobs():
-    """Get all jobs"""
+async def get_jobs(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str = None,
+    fields: str = None,
+):
+    """Get jobs one page at a time, optionally projected to a subset of fields"""
     try:
-        jobs = list(job_collection.find())
-        return jsonable_encoder({"jobs": serialize_docs(jobs)})
+        jobs, next_cursor = await run_in_threadpool(
+            find_page_by_id, job_collection, {}, limit, after, parse_fields(fields)
+        )
+        return jsonable_encoder({"jobs": serialize_docs(jobs), "nextCursor": next_cursor})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.get("/resumes/{job_code}")
-async def get_resumes(job_code: str):
-    """Get all resumes for a job"""
+async def get_resumes(
+    job_code: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str = None,
+    fields: str = None,
+):
+    """Get resumes for a job one page at a time, never including the PDF bytes"""
     try:
-        resumes = list(resume_collection.find({"jobCode": job_code}, {"fileData": 0}))  # Exclude binary data
-        return jsonable_encoder({"resumes": serialize_docs(resumes)})
+        resumes, next_cursor = await run_in_threadpool(
+            find_page_by_id, resume_collection, {"jobCode": job_code}, limit, after,
+            parse_fields(fields, never=("fileData",))  # Exclude binary data
+        )
+        return jsonable_encoder({"resumes": serialize_docs(resumes), "nextCursor": next_cursor})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
-print("Searching for job code ML2024 in jobs collection...")
-job = job_collection.find_one({"jobCode": "ML2024"})
-print("Found job:", job)
-jobs = list(job_collection.find())
-print("All jobs in jobs collection:", jobs)
-print("Connected to DB:", db.name)
-print("Sample job document:", job_collection.find_one())
-print(client.list_database_names())
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,126 +1,154 @@
 import json
 import os
-import requests
-import re
 from dotenv import load_dotenv
 
-# Load API key from .env
+from cache import content_hash
+from llm import LLMClient, LLMError, get_llm_client
+from llm_json import extract_json_array, extract_json_object
+from parser import RESUME_SCHEMA, validate_resume_profile
+from prompt_budget import (
+    JD_TOKEN_BUDGET,
+    PARSE_TOKEN_BUDGET,
+    RESUME_TOKEN_BUDGET,
+    compact_resume_text,
+    compress_text,
+    dedupe_skills,
+    as_list,
+    format_education,
+    format_experience,
+    jd_terms,
+    relevance,
+)
+from ranker import tokenize
+
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Headers for Gemini API - Key is passed as query param in the final URL
-HEADERS = {
-    "Content-Type": "application/json"
-}
+# Bump whenever the match prompt or result schema changes so cached matches are invalidated
+MATCH_PROMPT_VERSION = "2"
+
+# Batch scoring: how many resumes may share one request, and the input token budget per request
+MATCH_BATCH_SIZE = int(os.getenv("MATCH_BATCH_SIZE", "1"))
+MATCH_BATCH_TOKEN_BUDGET = int(os.getenv("MATCH_BATCH_TOKEN_BUDGET", "24000"))
+BATCH_PROMPT_OVERHEAD_TOKENS = 300
+
 
-# Gemini endpoint (using gemini-2.5-pro for complex structured tasks)
-GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1/models/gemini-2.5-pro:generateContent"
+def format_resume_for_llm(resume, jd_text="", budget_tokens=RESUME_TOKEN_BUDGET):
+    """Format parsed resume data for the match prompts, fitted to a token budget.
 
+    Skills are deduplicated with JD-relevant ones listed first. Work experience
+    and certifications are picked by relevance to the JD (recent roles break
+    ties) until the budget is spent, then written in their original order.
+    """
+    terms = jd_terms(jd_text)
+    budget_chars = budget_tokens * 4
 
-def format_resume_for_llm(resume):
-    """Format resume data for LLM processing"""
     lines = []
     lines.append(f"Name: {resume.get('Full Name', 'N/A')}")
     
-    contact_info = resume.get('Contact Information', {})
+    contact_info = resume.get('Contact Information') or {}
     if isinstance(contact_info, dict):
         lines.append(f"Email: {contact_info.get('email', 'N/A')}")
         lines.append(f"Phone: {contact_info.get('phone', 'N/A')}")
     else:
         lines.append(f"Contact: {contact_info}")
-    
-    # Skills
-    skills = resume.get("Skills", [])
-    if skills:
-        lines.append("Skills:")
-        lines.extend([f"- {skill}" for skill in skills[:10]])
-    
-    # Education
-    education = resume.get("Education", [])
+
+    # Education is short and always kept
+    education = [format_education(edu) for edu in as_list(resume.get("Education"))[:3]]
     if education:
-        lines.append("Education:")
-        for edu in education[:3]:
-            if isinstance(edu, dict):
-                degree = edu.get("Degree", "N/A")
-                fields = edu.get("Fields of Study", "N/A")
-                years = edu.get("Years Attended", "N/A")
-                lines.append(f"- {degree} in {fields} ({years})")
-            else:
-                lines.append(f"- {edu}")
-    
-    # Work Experience
-    work_exp = resume.get("Work Experience", [])
-    if work_exp:
+        education.insert(0, "Education:")
+    remaining = budget_chars - sum(len(line) + 1 for line in lines + education)
+
+    # Skills, JD-relevant first; they may use up to half of what is left
+    skills = dedupe_skills(resume.get("Skills"))
+    skills.sort(key=lambda skill: not terms & set(tokenize(skill)))
+    skill_line = ""
+    for skill in skills:
+        candidate = f"{skill_line}, {skill}" if skill_line else f"Skills: {skill}"
+        if len(candidate) > max(remaining // 2, 200):
+            break
+        skill_line = candidate
+    if skill_line:
+        lines.append(skill_line)
+        remaining -= len(skill_line) + 1
+    lines.extend(education)
+
+    # Work Experience: most relevant roles first, each with at most an even share of the rest
+    work_exp = [exp for exp in as_list(resume.get("Work Experience")) if exp]
+    ranked = sorted(
+        range(len(work_exp)),
+        key=lambda index: -(relevance(json.dumps(work_exp[index]), terms) + 0.1 / (1 + index)),
+    )
+    chosen = {}
+    for position, index in enumerate(ranked):
+        share = remaining // (len(ranked) - position)
+        line = format_experience(work_exp[index], terms, share)
+        if len(line) + 1 > remaining:
+            continue
+        chosen[index] = line
+        remaining -= len(line) + 1
+    if chosen:
         lines.append("Work Experience:")
-        for exp in work_exp[:5]:
-            if isinstance(exp, dict):
-                position = exp.get('Position', 'N/A')
-                company = exp.get('Company Name', 'N/A')
-                years = exp.get('Years Worked', 'N/A')
-                # Note: Achievements may contain detailed text, so we include it.
-                achievements = exp.get('Achievements', 'N/A') 
-                lines.append(f"- {position} at {company} ({years}): {achievements}")
-            else:
-                lines.append(f"- {exp}")
-    
-    # Certifications
-    certs = resume.get("Certifications", [])
-    if certs:
+        lines.extend(chosen[index] for index in sorted(chosen))
+
+    # Certifications, relevant first, while they fit
+    certs = dedupe_skills(resume.get("Certifications"))
+    certs.sort(key=lambda cert: -relevance(cert, terms))
+    cert_lines = [f"- {cert}" for cert in certs]
+    cert_lines = _fit_certifications(cert_lines, remaining - len("Certifications:") - 1)
+    if cert_lines:
         lines.append("Certifications:")
-        lines.extend([f"- {cert}" for cert in certs[:5]])
-    
+        lines.extend(cert_lines)
+
     return "\n".join(lines)
 
 
-def format_jd_for_llm(jd):
-    """Format job description for LLM processing"""
+def _fit_certifications(cert_lines, budget_chars):
+    kept = []
+    for line in cert_lines:
+        if len(line) + 1 <= budget_chars:
+            kept.append(line)
+            budget_chars -= len(line) + 1
+    return kept
+
+
+def format_jd_for_llm(jd, budget_tokens=JD_TOKEN_BUDGET):
+    """Format a job description for the LLM prompts, fitted to a token budget.
+
+    Title, required skills (deduplicated) and experience are always included;
+    qualifications and responsibilities are added item by item while they fit.
+    """
     lines = []
     lines.append(f"Job Title: {jd.get('Job Title', 'N/A')}")
     
-    required_skills = jd.get("Required Skills", [])
+    required_skills = dedupe_skills(jd.get("Required Skills"))
     if required_skills:
         lines.append(f"Required Skills: {', '.join(required_skills)}")
     
     lines.append(f"Experience Required: {jd.get('Experience Required', 'N/A')}")
-    
-    qualifications = jd.get("Qualifications", [])
-    if qualifications:
-        lines.append(f"Qualifications: {', '.join(qualifications)}")
-    
-    responsibilities = jd.get("Job Responsibilities", [])
-    if responsibilities:
-        lines.append(f"Responsibilities: {', '.join(responsibilities)}")
+
+    remaining = budget_tokens * 4 - sum(len(line) + 1 for line in lines)
+    for label, field in (("Qualifications", "Qualifications"), ("Responsibilities", "Job Responsibilities")):
+        items = []
+        seen = set()
+        for item in as_list(jd.get(field)):
+            item = compress_text(item).rstrip(".")
+            if not item or item.lower() in seen:
+                continue
+            seen.add(item.lower())
+            extra = len(item) + (len(label) + 3 if not items else 2)
+            if extra > remaining:
+                break
+            items.append(item)
+            remaining -= extra
+        if items:
+            lines.append(f"{label}: {', '.join(items)}")
     
     return "\n".join(lines)
 
 
-def extract_json_from_response(text):
-    """Extract the first valid JSON object from text response"""
-    try:
-        # Try to find JSON block using regex (non-greedy match)
-        json_match = re.search(r'\{.*?\}', text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-            # Simple cleanup for common LLM output issues
-            json_str = json_str.replace('},\n]', '}]').replace(',\n}', '}')
-            return json.loads(json_str)
-        else:
-            return json.loads(text)
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Could not extract valid JSON from response: {e}")
-
-
-def smart_match(jd_text, resume_text, threshold=60):
-    """Match candidate with job description using Gemini LLM"""
-    
-    if not GEMINI_API_KEY:
-        print("❌ GEMINI_API_KEY not found in environment.")
-        return {
-            "match_score": 0, "matched_skills": [], "missing_skills": [],
-            "summary": "API Key not configured.", "shortlist": False
-        }
-
-    prompt = f"""
+def build_match_prompt(jd_text, resume_text):
+    """Build the prompt for scoring one resume against a JD"""
+    return f"""
 You are an AI recruitment assistant. Evaluate the candidate's resume against the job description.
 Your response MUST be ONLY a valid JSON object.
 ENSURE YOUR RESPONSE STARTS AND ENDS WITH THE JSON BRACES {{...}}.
@@ -140,44 +168,203 @@ Job Description:
 Candidate Resume:
 {resume_text}
 """
-    # 1. Call Gemini API
-    payload = {
-        "contents": [{"role": "user", "parts": [{"text": prompt}]}],
-        "config": {
-            "temperature": 0.3,
-            "maxOutputTokens": 1000
-        }
+
+
+def parse_match_text(message_content, threshold=60):
+    """Turn the model's reply into a validated match result"""
+    # Extract and Validate JSON
+    result = extract_json_object(message_content)
+
+    # Ensure required fields and types
+    result["match_score"] = int(result.get("match_score", 0))
+    result["matched_skills"] = result.get("matched_skills", [])
+    result["missing_skills"] = result.get("missing_skills", [])
+    result["summary"] = result.get("summary", "Could not generate summary.")
+    # Determine shortlist based on threshold
+    result["shortlist"] = result["match_score"] >= threshold
+
+    return result
+
+
+def create_failed_match(reason):
+    """Default match result used when the LLM call or parsing fails"""
+    return {
+        "match_score": 0,
+        "matched_skills": [],
+        "missing_skills": [],
+        "summary": reason,
+        "shortlist": False
     }
 
-    # API Key appended to URL for this endpoint structure
-    url = f"{GEMINI_API_URL}?key={GEMINI_API_KEY}"
 
-    try:
-        response = requests.post(url, headers=HEADERS, json=payload, timeout=30)
-        response.raise_for_status()
-        
-        response_data = response.json()
-        message_content = response_data.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "").strip()
+def smart_match(jd_text, resume_text, threshold=60):
+    """Match candidate with job description using the configured LLM"""
+    llm = get_llm_client()
 
-        # 2. Extract and Validate JSON
-        result = extract_json_from_response(message_content)
+    if not llm.is_configured():
+        print("❌ LLM backend is not configured (missing API key?).")
+        return create_failed_match("API Key not configured.")
 
-        # 3. Ensure required fields and types
-        result["match_score"] = int(result.get("match_score", 0))
-        result["matched_skills"] = result.get("matched_skills", [])
-        result["missing_skills"] = result.get("missing_skills", [])
-        result["summary"] = result.get("summary", "Could not generate summary.")
-        # Determine shortlist based on threshold
-        result["shortlist"] = result["match_score"] >= threshold
+    prompt = build_match_prompt(jd_text, resume_text)
 
-        return result
+    try:
+        # 1. Call the LLM
+        message_content = llm.generate(prompt, "match", max_output_tokens=1000)
+
+        # 2. Extract and validate the result
+        return parse_match_text(message_content, threshold)
         
-    except (requests.exceptions.RequestException, json.JSONDecodeError, KeyError, ValueError) as e:
+    except (LLMError, json.JSONDecodeError, KeyError, ValueError) as e:
         print(f"❌ API call or JSON parsing error: {e}")
-        return {
-            "match_score": 0,
-            "matched_skills": [],
-            "missing_skills": [],
-            "summary": f"Could not parse result due to an error: {e}",
-            "shortlist": False
-        }
\ No newline at end of file
+        return create_failed_match(f"Could not parse result due to an error: {e}")
+
+
+async def smart_match_async(jd_text, resume_text, client: LLMClient, threshold=60):
+    """Async variant of smart_match that reuses the shared LLM client.
+
+    Raises on API or parsing errors instead of returning create_failed_match,
+    so callers can avoid caching failures.
+    """
+    prompt = build_match_prompt(jd_text, resume_text)
+    message_content = await client.agenerate(prompt, "match", max_output_tokens=1000)
+    return parse_match_text(message_content, threshold)
+
+
+def build_batch_match_prompt(jd_text, resume_texts):
+    """Build one prompt that scores several resumes against the same JD"""
+    candidates = "\n\n".join(
+        f"### Candidate {index}\n{resume_text}" for index, resume_text in enumerate(resume_texts)
+    )
+    return f"""
+You are an AI recruitment assistant. Evaluate EACH candidate's resume against the job description independently.
+Your response MUST be ONLY a valid JSON array with exactly {len(resume_texts)} objects, one per candidate.
+ENSURE YOUR RESPONSE STARTS AND ENDS WITH THE JSON BRACKETS [...].
+
+Each object must have these exact keys and data types:
+{{
+    "candidate_id": 0, // integer id from the "### Candidate <id>" heading
+    "match_score": 75, // integer score from 0 to 100
+    "matched_skills": ["skill1", "skill2"], // array of strings
+    "missing_skills": ["skill3", "skill4"], // array of strings
+    "summary": "Brief evaluation summary", // string
+    "shortlist": true // boolean
+}}
+
+Job Description:
+{jd_text}
+
+Candidates:
+{candidates}
+"""
+
+
+def validate_match_result(item, threshold=60):
+    """Check one batch entry against the match schema; return a normalized result or None"""
+    if not isinstance(item, dict):
+        return None
+    try:
+        score = int(item["match_score"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    matched = item.get("matched_skills", [])
+    missing = item.get("missing_skills", [])
+    summary = item.get("summary")
+    if not 0 <= score <= 100 or not isinstance(summary, str):
+        return None
+    if not isinstance(matched, list) or not isinstance(missing, list):
+        return None
+    return {
+        "match_score": score,
+        "matched_skills": [str(skill) for skill in matched],
+        "missing_skills": [str(skill) for skill in missing],
+        "summary": summary,
+        "shortlist": score >= threshold
+    }
+
+
+def parse_batch_match_text(message_content, count, threshold=60):
+    """Map a batch reply onto per-candidate results; invalid or missing entries are None"""
+    items = extract_json_array(message_content)
+
+    results = [None] * count
+    for position, item in enumerate(items):
+        candidate_id = item.get("candidate_id", position) if isinstance(item, dict) else position
+        if not isinstance(candidate_id, int) or not 0 <= candidate_id < count or results[candidate_id] is not None:
+            continue
+        results[candidate_id] = validate_match_result(item, threshold)
+    return results
+
+
+async def smart_match_batch_async(jd_text, resume_texts, client: LLMClient, threshold=60):
+    """Score several resumes against one JD in a single request.
+
+    Returns one entry per resume, None where the model's entry failed validation.
+    Raises on API errors or if the response is not a JSON array at all.
+    """
+    prompt = build_batch_match_prompt(jd_text, resume_texts)
+    message_content = await client.agenerate(
+        prompt, "match", max_output_tokens=min(8192, 600 * len(resume_texts)), timeout=60
+    )
+    return parse_batch_match_text(message_content, len(resume_texts), threshold)
+
+
+def build_parse_match_prompt(jd_text, text):
+    """Build one prompt that parses raw resume text and scores it against a JD"""
+    return f"""
+You are an expert resume parser and AI recruitment assistant. Extract the candidate's profile from the resume text,
+then evaluate it against the job description.
+Your response MUST be ONLY a valid JSON object.
+ENSURE YOUR RESPONSE STARTS AND ENDS WITH THE JSON BRACES {{...}}.
+
+Required JSON format:
+{{
+    "profile": {RESUME_SCHEMA},
+    "match": {{
+        "match_score": 75, // integer score from 0 to 100
+        "matched_skills": ["skill1", "skill2"], // array of strings
+        "missing_skills": ["skill3", "skill4"], // array of strings
+        "summary": "Brief evaluation summary", // string
+        "shortlist": true // boolean
+    }}
+}}
+
+Job Description:
+{jd_text}
+
+Resume Text:
+{compact_resume_text(text, PARSE_TOKEN_BUDGET)}
+"""
+
+
+def parse_parse_match_text(message_content, text, threshold=60):
+    """Split a single-pass reply into (resume_data, match); raise ValueError if either part is invalid"""
+    result = extract_json_object(message_content)
+    resume_data = validate_resume_profile(result.get("profile"), text)
+    if resume_data is None:
+        raise ValueError("Single-pass response has no valid profile")
+    match = validate_match_result(result.get("match"), threshold)
+    if match is None:
+        raise ValueError("Single-pass response has no valid match result")
+    return resume_data, match
+
+
+async def smart_parse_match_async(jd_text, text, client: LLMClient, threshold=60):
+    """Parse and score a resume in one request; returns (resume_data, match).
+
+    Raises on API errors or when the reply does not fit the schema, so callers
+    can fall back to the separate parse and match calls.
+    """
+    if not text.strip():
+        raise ValueError("No text could be extracted from the PDF")
+    prompt = build_parse_match_prompt(jd_text, text)
+    message_content = await client.agenerate(prompt, "match", max_output_tokens=3000)
+    return parse_parse_match_text(message_content, text, threshold)
+
+
+def match_cache_key(jd_text, resume_text, threshold=60):
+    """Cache key for a match result: JD and resume fingerprints plus backend, model, prompt version and threshold"""
+    llm = get_llm_client()
+    return content_hash(
+        content_hash(jd_text), content_hash(resume_text), llm.backend.name, llm.model_for("match"),
+        MATCH_PROMPT_VERSION, str(threshold)
+    )
@@ -0,0 +1,184 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Latency buckets (seconds) shared by every stage histogram
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    body = ",".join(f'{key}="{str(value)}"' for key, value in labels.items())
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    type = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in self.values.items()]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    type = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            # [per-bucket counts, sum, count]
+            state = self.values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self.values.items():
+                labels = dict(zip(self.labelnames, key))
+                for bound, bucket_count in zip(self.buckets, counts):
+                    samples.append((f"{self.name}_bucket", {**labels, "le": bound}, bucket_count))
+                samples.append((f"{self.name}_bucket", {**labels, "le": "+Inf"}, count))
+                samples.append((f"{self.name}_sum", labels, total))
+                samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class Registry:
+    """Holds metrics plus collector callbacks and renders the Prometheus text format.
+
+    A collector returns (name, type, help, [(labels, value), ...]) tuples read
+    from live objects (caches, the LLM client, the run queue) at scrape time.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=STAGE_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for collector in self.collectors:
+            for name, metric_type, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "smartmatch_stage_seconds", "Time spent in each pipeline stage", ["stage"]
+)
+ERRORS = REGISTRY.counter(
+    "smartmatch_errors_total", "Errors by pipeline stage and exception type", ["stage", "type"]
+)
+LLM_TOKENS = REGISTRY.counter(
+    "smartmatch_llm_tokens_total", "LLM tokens reported by the backend, by stage and direction", ["stage", "direction"]
+)
+LLM_BYTES = REGISTRY.counter(
+    "smartmatch_llm_bytes_total", "HTTP body bytes exchanged with the LLM backend", ["stage", "direction"]
+)
+RESUMES = REGISTRY.counter(
+    "smartmatch_resumes_total", "Shortlist entries produced, by outcome", ["outcome"]
+)
+
+# Per-run trace ({resume_id: {stage: seconds}}) and the resume the current task is working on
+_run_trace = ContextVar("run_trace", default=None)
+_trace_resume = ContextVar("trace_resume", default=None)
+
+
+def start_trace(trace):
+    """Collect per-resume stage timings of tasks started from here into `trace`"""
+    _run_trace.set(trace)
+
+
+def trace_resume(resume_id):
+    """Attribute stage timings in the current task to this resume"""
+    _trace_resume.set(str(resume_id))
+
+
+def add_trace(resume_id, stage, seconds):
+    """Add time to a resume's stage in the current run trace, if tracing is on"""
+    trace = _run_trace.get()
+    if trace is None or resume_id is None:
+        return
+    stages = trace.setdefault(str(resume_id), {})
+    stages[stage] = round(stages.get(stage, 0.0) + seconds, 4)
+
+
+def observe_stage(stage, seconds, resume_id=None):
+    """Record one stage duration in the histogram and the current resume's trace"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    add_trace(resume_id if resume_id is not None else _trace_resume.get(), stage, seconds)
+
+
+@contextmanager
+def stage_timer(stage):
+    """Time the enclosed block as one observation of `stage`"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def summarize_trace(trace):
+    """Per-stage totals over all resumes of a run trace, slowest stage first"""
+    totals = {}
+    for stages in trace.values():
+        for stage, seconds in stages.items():
+            totals[stage] = totals.get(stage, 0.0) + seconds
+    return {stage: round(seconds, 4) for stage, seconds in sorted(totals.items(), key=lambda item: -item[1])}
@@ -1,123 +1,93 @@
-import io
 import fitz  # PyMuPDF
-import json
-import os
-import requests
-import re
 from dotenv import load_dotenv
 
-load_dotenv()
-
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1/models/gemini-2.5-pro:generateContent"
-
-# Validate API key
-if not GEMINI_API_KEY:
-    print("⚠️  WARNING: GEMINI_API_KEY not found in environment variables")
-
-HEADERS = {
-    "Content-Type": "application/json"
-}
+from cache import content_hash
+from extract import PARSE_TEXT_BUDGET, extract_text
+from llm import LLMClient, LLMError, get_llm_client
+from llm_json import extract_json_object
+from prompt_budget import PARSE_TOKEN_BUDGET, compact_resume_text
 
-def extract_json_from_response(text):
-    """Extract the first valid JSON object from text response"""
-    try:
-        # Try to find JSON block using regex (non-greedy match)
-        json_match = re.search(r'\{.*?\}', text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-            # Try to parse the extracted JSON
-            return json.loads(json_str)
-        else:
-            # If no JSON block found, try parsing the entire text
-            return json.loads(text)
-    except json.JSONDecodeError:
-        # If JSON parsing fails, try to find the largest JSON-like structure
-        json_match = re.search(r'\{[\s\S]*\}', text)
-        if json_match:
-            try:
-                return json.loads(json_match.group(0))
-            except json.JSONDecodeError:
-                pass
-        raise ValueError("Could not extract valid JSON from response")
-
-def parse_resume_with_llm_binary(file_bytes: bytes):
-    """Parse PDF resume from binary data using Gemini LLM"""
-    try:
-        # Create BytesIO stream from bytes
-        stream = io.BytesIO(file_bytes)
-        
-        # Open PDF with PyMuPDF
-        doc = fitz.open(stream=stream, filetype="pdf")
-        
-        # Extract text from all pages
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        
-        doc.close()  # Close the document
-        
-        if not text.strip():
-            raise ValueError("No text could be extracted from the PDF")
+load_dotenv()
 
-        prompt = f"""
-You are an expert resume parser AI. Extract information from the following resume text and respond with ONLY a valid JSON object.
+# Bump whenever the parse prompt or output schema changes so cached parses are invalidated
+PARSE_PROMPT_VERSION = "2"
 
-Required JSON format:
-{{
+# JSON shape of a parsed resume, shared by the parse prompt and the single-pass parse+match prompt
+RESUME_SCHEMA = """{
     "Full Name": "string",
-    "Contact Information": {{
+    "Contact Information": {
         "email": "string",
         "phone": "string"
-    }},
+    },
     "Skills": ["skill1", "skill2", "skill3"],
-    "Education": [{{
+    "Education": [{
         "Degree": "string",
         "Fields of Study": "string",
         "Years Attended": "string"
-    }}],
-    "Work Experience": [{{
+    }],
+    "Work Experience": [{
         "Position": "string",
         "Company Name": "string",
         "Years Worked": "string",
         "Achievements": "string"
-    }}],
+    }],
     "Certifications": ["cert1", "cert2"]
-}}
+}"""
+
+def build_parse_prompt(text):
+    """Build the prompt for parsing resume text"""
+    return f"""
+You are an expert resume parser AI. Extract information from the following resume text and respond with ONLY a valid JSON object.
+
+Required JSON format:
+{RESUME_SCHEMA}
 
 Resume Text:
-{text[:4000]}
+{compact_resume_text(text, PARSE_TOKEN_BUDGET)}
         """
 
-        data = {
-            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
-            "config": {
-                "temperature": 0.3,
-                "maxOutputTokens": 2000
-            }
-        }
+def parse_llm_text(message_content, text):
+    """Turn the model's reply into the structured resume dict"""
+    # Extract JSON from response
+    structured = extract_json_object(message_content)
+
+    # Add raw text to the result
+    structured["Raw Text"] = text
+
+    return structured
+
+def validate_resume_profile(profile, text=""):
+    """Check a parsed resume against RESUME_SCHEMA; return it with defaults filled in, or None"""
+    if not isinstance(profile, dict) or not isinstance(profile.get("Full Name"), str):
+        return None
+    for key in ("Skills", "Education", "Work Experience", "Certifications"):
+        profile.setdefault(key, [])
+        if not isinstance(profile[key], list):
+            return None
+    contact = profile.setdefault("Contact Information", {"email": "N/A", "phone": "N/A"})
+    if not isinstance(contact, (dict, str)):
+        return None
+    profile["Raw Text"] = text
+    return profile
 
-        # API Key appended to URL for Gemini endpoint structure
-        url = f"{GEMINI_API_URL}?key={GEMINI_API_KEY}"
-        response = requests.post(url, headers=HEADERS, json=data, timeout=30)
-        response.raise_for_status()
+def parse_resume_with_llm_binary(file_bytes: bytes):
+    """Parse PDF resume from binary data using the configured LLM"""
+    llm = get_llm_client()
+    try:
+        text, _ = extract_text(file_bytes)
 
-        response_data = response.json()
-        message_content = response_data.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "").strip()
+        if not text.strip():
+            raise ValueError("No text could be extracted from the PDF")
 
-        # Extract JSON from response
-        structured = extract_json_from_response(message_content)
-        
-        # Add raw text to the result
-        structured["Raw Text"] = text
+        message_content = llm.generate(build_parse_prompt(text), "parse", max_output_tokens=2000)
 
-        return structured
+        return parse_llm_text(message_content, text)
 
-    except requests.exceptions.RequestException as e:
+    except LLMError as e:
         print(f"❌ API request error in parse_resume_with_llm_binary: {e}")
-        print(f"❌ GEMINI_API_KEY configured: {'Yes' if GEMINI_API_KEY else 'No'}")
+        print(f"❌ LLM backend configured: {'Yes' if llm.is_configured() else 'No'}")
         return create_default_response(text if 'text' in locals() else "")
-    except fitz.fitz.FileDataError as e:
+    except fitz.FileDataError as e:
         print(f"❌ PDF parsing error in parse_resume_with_llm_binary: {e}")
         return create_default_response("")
     except ValueError as e:
@@ -128,6 +98,28 @@ Resume Text:
         print(f"❌ Error type: {type(e).__name__}")
         return create_default_response(text if 'text' in locals() else "")
 
+async def parse_resume_text_async(text, client: LLMClient):
+    """Parse already-extracted resume text over the shared LLM client.
+
+    Unlike parse_resume_with_llm_binary this raises on failure so callers can
+    tell a real parse apart from create_default_response.
+    """
+    if not text.strip():
+        raise ValueError("No text could be extracted from the PDF")
+
+    message_content = await client.agenerate(build_parse_prompt(text), "parse", max_output_tokens=2000)
+
+    return parse_llm_text(message_content, text)
+
+def parse_cache_key(pdf_hash: str):
+    """Cache key for a parsed resume: PDF SHA-256 (see resume_files.pdf_sha256) plus backend, model,
+    prompt version and text/token budgets"""
+    llm = get_llm_client()
+    return content_hash(
+        pdf_hash, llm.backend.name, llm.model_for("parse"), PARSE_PROMPT_VERSION, str(PARSE_TEXT_BUDGET),
+        str(PARSE_TOKEN_BUDGET)
+    )
+
 def create_default_response(text=""):
     """Create default response structure when parsing fails"""
     return {
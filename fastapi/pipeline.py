@@ -0,0 +1,640 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from extract import extract_text_async
+from match import (
+    BATCH_PROMPT_OVERHEAD_TOKENS,
+    MATCH_BATCH_SIZE,
+    MATCH_BATCH_TOKEN_BUDGET,
+    create_failed_match,
+    format_resume_for_llm,
+    match_cache_key,
+    smart_match_async,
+    smart_match_batch_async,
+    smart_parse_match_async,
+)
+from llm import LLMError, get_llm_client
+from parser import (
+    create_default_response,
+    parse_cache_key,
+    parse_resume_text_async,
+)
+from prompt_budget import estimate_tokens
+from metrics import ERRORS, STAGE_SECONDS, add_trace, stage_timer, trace_resume
+from resilience import CircuitOpenError
+from resume_files import pdf_sha256
+from ranker import PREFILTER_MIN_SCORE, PREFILTER_TOP_K, rank_candidates, select_top_candidates
+
+load_dotenv()
+
+# Maximum number of resumes in flight at once (extraction + parse + match)
+MATCH_CONCURRENCY = int(os.getenv("MATCH_CONCURRENCY", "8"))
+
+# Parse tasks currently running, keyed by parse cache key
+_inflight_parses = {}
+
+
+def build_shortlist_entry(resume_doc, job_code, resume_data, match):
+    """Create the shortlist document for a successfully matched resume"""
+    contact_info = resume_data.get("Contact Information")
+    return {
+        "candidateName": resume_data.get("Full Name", "N/A"),
+        "email": contact_info.get("email", "N/A") if isinstance(contact_info, dict) else "N/A",
+        "resumeId": str(resume_doc["_id"]),
+        "jobCode": job_code,
+        "score": match.get("match_score", 0),
+        "matchedSkills": match.get("matched_skills", []),
+        "missingSkills": match.get("missing_skills", []),
+        "summary": match.get("summary", "Could not generate summary."),
+        "shortlist": match.get("shortlist", False),
+        "dateShortlisted": datetime.utcnow()
+    }
+
+
+def build_failed_entry(resume_doc, job_code, error):
+    """Create the shortlist document recorded when a resume fails to process"""
+    ERRORS.inc(stage="resume", type=type(error).__name__)
+    return {
+        "candidateName": "Processing Failed",
+        "email": "N/A",
+        "resumeId": str(resume_doc["_id"]),
+        "jobCode": job_code,
+        "score": 0,
+        "matchedSkills": [],
+        "missingSkills": [],
+        "summary": f"Processing failed: {str(error)}",
+        "shortlist": False,
+        "dateShortlisted": datetime.utcnow()
+    }
+
+
+async def read_pdf(resume_doc, load_pdf=None):
+    """PDF bytes of a resume: inline fileData, or fetched on demand through load_pdf; None without a file"""
+    if resume_doc.get("fileData"):
+        return bytes(resume_doc["fileData"])
+    if load_pdf is None:
+        return None
+    with stage_timer("pdf_fetch"):
+        return await load_pdf(resume_doc)
+
+
+async def resume_pdf_hash(resume_doc, load_pdf=None):
+    """(pdf_hash, binary_data) for a resume; the PDF is only fetched when no contentHash is stored.
+
+    Returns (None, None) when the resume has no file.
+    """
+    if resume_doc.get("contentHash"):
+        return resume_doc["contentHash"], None
+    binary_data = await read_pdf(resume_doc, load_pdf)
+    if binary_data is None:
+        return None, None
+    # Remember the hash so later lookups (e.g. embedding the resume) need not refetch the PDF
+    resume_doc["contentHash"] = pdf_sha256(binary_data)
+    return resume_doc["contentHash"], binary_data
+
+
+async def parse_resume(resume_doc, client, parse_cache=None, load_pdf=None):
+    """Extract and LLM-parse a resume, reusing a cached parse of identical PDF bytes.
+
+    On a cache hit the PDF is never fetched. Returns None when the resume has no file.
+    """
+    pdf_hash, binary_data = await resume_pdf_hash(resume_doc, load_pdf)
+    if pdf_hash is None:
+        return None
+
+    key = parse_cache_key(pdf_hash) if parse_cache is not None else None
+    if key is not None:
+        with stage_timer("cache_lookup"):
+            cached = await asyncio.to_thread(parse_cache.get, key)
+        if cached is not None:
+            return cached
+
+        # Duplicate uploads in the same run share a single in-flight parse
+        pending = _inflight_parses.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+    if binary_data is None:
+        binary_data = await read_pdf(resume_doc, load_pdf)
+        if binary_data is None:
+            return None
+    if key is None:
+        return await _parse_resume_uncached(binary_data, client)
+
+    pending = asyncio.ensure_future(_parse_resume_uncached(binary_data, client, parse_cache, key))
+    _inflight_parses[key] = pending
+    try:
+        return await asyncio.shield(pending)
+    finally:
+        if pending.done():
+            _inflight_parses.pop(key, None)
+        else:
+            pending.add_done_callback(lambda task: _release_inflight(key, task))
+
+
+def _discard_tasks(tasks):
+    """Cancel unfinished tasks and read the errors of finished ones, so an aborted run logs nothing extra"""
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            task.exception()
+
+
+def _release_inflight(key, task):
+    """Forget a finished in-flight parse; reading its exception stops asyncio logging it as unhandled"""
+    _inflight_parses.pop(key, None)
+    if not task.cancelled():
+        task.exception()
+
+
+async def _parse_resume_uncached(binary_data, client, parse_cache=None, key=None):
+    """Run PDF extraction and the parse LLM call, storing successes in the cache"""
+    # PDF extraction is CPU-bound, run it in the extraction process pool
+    with stage_timer("pdf_extract"):
+        text, _ = await extract_text_async(binary_data)
+    return await _parse_text(text, client, parse_cache, key)
+
+
+async def _parse_text(text, client, parse_cache=None, key=None):
+    """Parse already-extracted resume text, storing successes in the cache"""
+    try:
+        with stage_timer("parse_llm"):
+            resume_data = await parse_resume_text_async(text, client)
+    except LLMError as e:
+        # Retries are exhausted; fail this resume rather than match an empty profile
+        print(f"❌ API request error in parse_resume: {e}")
+        print(f"❌ LLM backend configured: {'Yes' if client.is_configured() else 'No'}")
+        raise
+    except ValueError as e:
+        ERRORS.inc(stage="parse", type=type(e).__name__)
+        print(f"❌ JSON parsing error in parse_resume: {e}")
+        return create_default_response(text)
+
+    # Only successful parses are cached; failures should be retried next run
+    if parse_cache is not None:
+        await asyncio.to_thread(parse_cache.set, key, resume_data)
+    return resume_data
+
+
+async def match_resume(jd_text, resume_text, client, threshold=60, match_cache=None):
+    """Score a formatted resume against a JD, reusing the result when neither text changed"""
+    if not client.is_configured():
+        print("❌ LLM backend is not configured (missing API key?).")
+        return create_failed_match("API Key not configured.")
+
+    key = match_cache_key(jd_text, resume_text, threshold) if match_cache is not None else None
+    if key is not None:
+        with stage_timer("cache_lookup"):
+            cached = await asyncio.to_thread(match_cache.get, key)
+        if cached is not None:
+            return cached
+
+    try:
+        with stage_timer("match_llm"):
+            match = await smart_match_async(jd_text, resume_text, client, threshold=threshold)
+    except LLMError as e:
+        # Retries are exhausted; a made-up score of 0 would look like a real verdict
+        print(f"❌ API call error: {e}")
+        raise
+    except (KeyError, ValueError) as e:
+        ERRORS.inc(stage="match", type=type(e).__name__)
+        print(f"❌ JSON parsing error: {e}")
+        return create_failed_match(f"Could not parse result due to an error: {e}")
+
+    if key is not None:
+        await asyncio.to_thread(match_cache.set, key, match)
+    return match
+
+
+async def process_resume(resume_doc, jd_text, job_code, client, semaphore, threshold=60, parse_cache=None,
+                         match_cache=None, load_pdf=None):
+    """Run one resume through extraction, LLM parsing and LLM matching"""
+    async with semaphore:
+        try:
+            trace_resume(resume_doc["_id"])
+            print(f"🔄 Processing resume {resume_doc.get('_id')}...")
+
+            # Stages 1-2: fetch the PDF, extract text and parse resume (all skipped on a cache hit)
+            resume_data = await parse_resume(resume_doc, client, parse_cache, load_pdf)
+            if resume_data is None:
+                print(f"❌ No file data found for resume {resume_doc.get('_id')}")
+                return None
+            print(f"✅ Resume parsed successfully: {resume_data.get('Full Name', 'N/A')}")
+
+            resume_text = format_resume_for_llm(resume_data, jd_text)
+
+            # Stage 3: perform matching (skipped when this JD/resume pair was already scored)
+            match = await match_resume(jd_text, resume_text, client, threshold, match_cache)
+            print(f"✅ Match completed with score: {match.get('match_score', 0)}")
+
+            return build_shortlist_entry(resume_doc, job_code, resume_data, match)
+
+        except CircuitOpenError:
+            # The backend is down: stop the run instead of recording every resume as failed
+            raise
+        except Exception as e:
+            print(f"❌ Error processing resume {resume_doc.get('_id')}: {e}")
+            print(f"❌ Error type: {type(e).__name__}")
+            # Create a default entry for failed resumes to help with debugging
+            return build_failed_entry(resume_doc, job_code, e)
+
+
+async def process_resume_single_pass(resume_doc, jd_text, job_code, client, semaphore, threshold=60,
+                                     parse_cache=None, match_cache=None, load_pdf=None):
+    """Parse and match a resume with one LLM request, filling both caches.
+
+    Resumes whose parse is already cached, and replies that fail schema
+    validation, go through the separate parse and match calls instead.
+    """
+    async with semaphore:
+        try:
+            trace_resume(resume_doc["_id"])
+            print(f"🔄 Processing resume {resume_doc.get('_id')} in a single pass...")
+            pdf_hash, binary_data = await resume_pdf_hash(resume_doc, load_pdf)
+            if pdf_hash is None:
+                print(f"❌ No file data found for resume {resume_doc.get('_id')}")
+                return None
+            key = parse_cache_key(pdf_hash) if parse_cache is not None else None
+            resume_data = None
+            if key is not None:
+                with stage_timer("cache_lookup"):
+                    resume_data = await asyncio.to_thread(parse_cache.get, key)
+
+            if resume_data is None:
+                if binary_data is None:
+                    binary_data = await read_pdf(resume_doc, load_pdf)
+                    if binary_data is None:
+                        print(f"❌ No file data found for resume {resume_doc.get('_id')}")
+                        return None
+                with stage_timer("pdf_extract"):
+                    text, _ = await extract_text_async(binary_data)
+                match = None
+                if client.is_configured():
+                    try:
+                        with stage_timer("parse_match_llm"):
+                            resume_data, match = await smart_parse_match_async(jd_text, text, client, threshold)
+                    except ValueError as e:
+                        ERRORS.inc(stage="parse_match", type=type(e).__name__)
+                        print(f"⚠️  WARNING: Single-pass reply rejected, using separate calls: {e}")
+
+                if match is not None:
+                    print(f"✅ Resume parsed and matched with score: {match['match_score']}")
+                    if parse_cache is not None:
+                        await asyncio.to_thread(parse_cache.set, key, resume_data)
+                    if match_cache is not None:
+                        match_key = match_cache_key(jd_text, format_resume_for_llm(resume_data, jd_text), threshold)
+                        await asyncio.to_thread(match_cache.set, match_key, match)
+                    return build_shortlist_entry(resume_doc, job_code, resume_data, match)
+
+                resume_data = await _parse_text(text, client, parse_cache, key)
+
+            resume_text = format_resume_for_llm(resume_data, jd_text)
+            match = await match_resume(jd_text, resume_text, client, threshold, match_cache)
+            print(f"✅ Match completed with score: {match.get('match_score', 0)}")
+            return build_shortlist_entry(resume_doc, job_code, resume_data, match)
+
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            print(f"❌ Error processing resume {resume_doc.get('_id')}: {e}")
+            print(f"❌ Error type: {type(e).__name__}")
+            return build_failed_entry(resume_doc, job_code, e)
+
+
+async def prepare_resume(resume_doc, jd_text, client, semaphore, parse_cache=None, load_pdf=None):
+    """Stages 1-2 for batch mode: return (resume_data, resume_text), or None without file data"""
+    async with semaphore:
+        trace_resume(resume_doc["_id"])
+        print(f"🔄 Processing resume {resume_doc.get('_id')}...")
+        resume_data = await parse_resume(resume_doc, client, parse_cache, load_pdf)
+        if resume_data is None:
+            print(f"❌ No file data found for resume {resume_doc.get('_id')}")
+            return None
+        print(f"✅ Resume parsed successfully: {resume_data.get('Full Name', 'N/A')}")
+        return resume_data, format_resume_for_llm(resume_data, jd_text)
+
+
+async def match_resume_batch(jd_text, items, job_code, client, semaphore, threshold=60, match_cache=None):
+    """Stage 3 for batch mode: score (resume_doc, resume_data, resume_text) items in one request.
+
+    Entries the model got wrong (or the whole batch, on an API error) fall back
+    to a single-candidate match_resume call.
+    """
+    resume_texts = [resume_text for _, _, resume_text in items]
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            results = await smart_match_batch_async(jd_text, resume_texts, client, threshold=threshold)
+        except (LLMError, KeyError, ValueError) as e:
+            ERRORS.inc(stage="match_batch", type=type(e).__name__)
+            print(f"❌ Batch match failed, falling back to single calls: {e}")
+            results = [None] * len(items)
+        # One request serves the whole batch, so every resume in it waited the full time
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage="match_batch_llm")
+        for resume_doc, _, _ in items:
+            add_trace(resume_doc["_id"], "match_batch_llm", elapsed)
+    print(f"✅ Batch of {len(items)} matched, {results.count(None)} need a single-candidate retry")
+
+    async def finish(item, match):
+        resume_doc, resume_data, resume_text = item
+        trace_resume(resume_doc["_id"])
+        if match is None:
+            try:
+                async with semaphore:
+                    match = await match_resume(jd_text, resume_text, client, threshold, match_cache)
+            except LLMError as e:
+                return build_failed_entry(resume_doc, job_code, e)
+        elif match_cache is not None:
+            await asyncio.to_thread(match_cache.set, match_cache_key(jd_text, resume_text, threshold), match)
+        return build_shortlist_entry(resume_doc, job_code, resume_data, match)
+
+    return await asyncio.gather(*(finish(item, match) for item, match in zip(items, results)))
+
+
+async def _iter_batched_results(job_code, jd_text, resumes, client, semaphore, threshold, batch_size,
+                                parse_cache, match_cache, load_pdf):
+    """Parse resumes concurrently and score cache misses in token-budgeted batches"""
+    prepare_tasks = {
+        asyncio.create_task(prepare_resume(resume_doc, jd_text, client, semaphore, parse_cache, load_pdf)): resume_doc
+        for resume_doc in resumes
+    }
+    batch_tasks = {}
+    running = set(prepare_tasks)
+    created = list(prepare_tasks)
+    base_tokens = estimate_tokens(jd_text) + BATCH_PROMPT_OVERHEAD_TOKENS
+    pending, pending_tokens = [], base_tokens
+
+    def launch_batch():
+        nonlocal pending, pending_tokens
+        task = asyncio.create_task(
+            match_resume_batch(jd_text, pending, job_code, client, semaphore, threshold, match_cache)
+        )
+        batch_tasks[task] = pending
+        running.add(task)
+        created.append(task)
+        pending, pending_tokens = [], base_tokens
+
+    try:
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            running.difference_update(done)
+            for task in done:
+                if task in batch_tasks:
+                    items = batch_tasks.pop(task)
+                    if isinstance(task.exception(), CircuitOpenError):
+                        raise task.exception()
+                    if task.exception() is not None:
+                        for resume_doc, _, _ in items:
+                            yield build_failed_entry(resume_doc, job_code, task.exception())
+                        continue
+                    for entry in task.result():
+                        yield entry
+                    continue
+
+                resume_doc = prepare_tasks[task]
+                if isinstance(task.exception(), CircuitOpenError):
+                    raise task.exception()
+                if task.exception() is not None:
+                    e = task.exception()
+                    print(f"❌ Error processing resume {resume_doc.get('_id')}: {e}")
+                    print(f"❌ Error type: {type(e).__name__}")
+                    yield build_failed_entry(resume_doc, job_code, e)
+                    continue
+                if task.result() is None:
+                    continue
+
+                resume_data, resume_text = task.result()
+                if match_cache is not None:
+                    cached = await asyncio.to_thread(
+                        match_cache.get, match_cache_key(jd_text, resume_text, threshold)
+                    )
+                    if cached is not None:
+                        yield build_shortlist_entry(resume_doc, job_code, resume_data, cached)
+                        continue
+
+                tokens = estimate_tokens(resume_text)
+                if pending and (len(pending) >= batch_size or pending_tokens + tokens > MATCH_BATCH_TOKEN_BUDGET):
+                    launch_batch()
+                pending.append((resume_doc, resume_data, resume_text))
+                pending_tokens += tokens
+
+            # Once every resume is parsed, send whatever is left as a final partial batch
+            if pending and not any(task in prepare_tasks for task in running):
+                launch_batch()
+    finally:
+        _discard_tasks(created)
+
+
+async def load_resume_text(resume_doc, semaphore, parse_cache=None, load_pdf=None):
+    """Stage 1 for pre-filter mode, without any LLM call: (cached_parse, text, parse_key).
+
+    A cached parse brings its own raw text and the PDF is not fetched;
+    otherwise the PDF is fetched and its text extracted. Returns None when the
+    resume has no file.
+    """
+    async with semaphore:
+        trace_resume(resume_doc["_id"])
+        pdf_hash, binary_data = await resume_pdf_hash(resume_doc, load_pdf)
+        if pdf_hash is None:
+            print(f"❌ No file data found for resume {resume_doc.get('_id')}")
+            return None
+        key = parse_cache_key(pdf_hash) if parse_cache is not None else None
+        if key is not None:
+            with stage_timer("cache_lookup"):
+                cached = await asyncio.to_thread(parse_cache.get, key)
+            if cached is not None:
+                return cached, cached.get("Raw Text") or "", key
+        if binary_data is None:
+            binary_data = await read_pdf(resume_doc, load_pdf)
+            if binary_data is None:
+                return None
+        with stage_timer("pdf_extract"):
+            text, _ = await extract_text_async(binary_data)
+        return None, text, key
+
+
+async def _iter_prefiltered_results(job_code, jd_text, resumes, client, semaphore, threshold, batch_size,
+                                    parse_cache, match_cache, load_pdf, required_skills, top_k, min_local_score):
+    """Rank resumes locally on their extracted text; only the best are LLM-parsed and matched.
+
+    A cold run therefore costs at most top_k parse calls plus top_k match calls,
+    however many resumes the job has.
+    """
+    load_tasks = {
+        asyncio.create_task(load_resume_text(resume_doc, semaphore, parse_cache, load_pdf)): resume_doc
+        for resume_doc in resumes
+    }
+    parse_tasks = {}
+    match_tasks = set()
+    try:
+        # Stage 1 for every resume; failures are reported straight away
+        loaded = []
+        for task in load_tasks:
+            resume_doc = load_tasks[task]
+            try:
+                result = await task
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                print(f"❌ Error processing resume {resume_doc.get('_id')}: {e}")
+                yield build_failed_entry(resume_doc, job_code, e)
+                continue
+            if result is not None:
+                loaded.append((resume_doc, *result))
+
+        # Local ranking decides who is worth LLM calls; parsed skills are used where a parse is cached
+        ranked = [cached or {"Raw Text": text, "Skills": []} for _, cached, text, _ in loaded]
+        scores = await asyncio.to_thread(rank_candidates, required_skills, jd_text, ranked)
+        selected = select_top_candidates(scores, top_k=top_k, min_score=min_local_score)
+        print(f"✅ Pre-filter kept {len(selected)} of {len(loaded)} candidates for LLM matching")
+        local_scores = {str(loaded[index][0]["_id"]): round(float(scores[index]), 4) for index in range(len(loaded))}
+
+        selected_set = set(selected)
+        for index, (resume_doc, cached, text, _) in enumerate(loaded):
+            if index in selected_set:
+                continue
+            # An earlier LLM verdict for this pair is still the best answer we have
+            match = None
+            if cached is not None and match_cache is not None:
+                resume_text = format_resume_for_llm(cached, jd_text)
+                match = await asyncio.to_thread(match_cache.get, match_cache_key(jd_text, resume_text, threshold))
+            resume_data = cached if cached is not None else create_default_response(text)
+            if match is not None:
+                entry = build_shortlist_entry(resume_doc, job_code, resume_data, match)
+            else:
+                match = create_failed_match("Not sent to LLM: ranked below the local pre-filter cutoff.")
+                entry = build_shortlist_entry(resume_doc, job_code, resume_data, match)
+                entry["notSentToLLM"] = True
+            entry["localScore"] = local_scores[entry["resumeId"]]
+            yield entry
+
+        # Stage 2 (LLM parse) for the selected candidates whose parse is not cached
+        async def parse_selected(resume_doc, cached, text, key):
+            if cached is not None:
+                return cached
+            async with semaphore:
+                trace_resume(resume_doc["_id"])
+                return await _parse_text(text, client, parse_cache, key)
+
+        for index in selected:
+            resume_doc = loaded[index][0]
+            parse_tasks[asyncio.create_task(parse_selected(*loaded[index]))] = resume_doc
+        items = []
+        for task in parse_tasks:
+            resume_doc = parse_tasks[task]
+            try:
+                resume_data = await task
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                print(f"❌ Error processing resume {resume_doc.get('_id')}: {e}")
+                entry = build_failed_entry(resume_doc, job_code, e)
+                entry["localScore"] = local_scores[entry["resumeId"]]
+                yield entry
+                continue
+            items.append((resume_doc, resume_data, format_resume_for_llm(resume_data, jd_text)))
+
+        # Stage 3 for the selected candidates only
+        async def match_one(item):
+            resume_doc, resume_data, resume_text = item
+            trace_resume(resume_doc["_id"])
+            try:
+                async with semaphore:
+                    match = await match_resume(jd_text, resume_text, client, threshold, match_cache)
+            except LLMError as e:
+                return [build_failed_entry(resume_doc, job_code, e)]
+            return [build_shortlist_entry(resume_doc, job_code, resume_data, match)]
+
+        if batch_size > 1:
+            base_tokens = estimate_tokens(jd_text) + BATCH_PROMPT_OVERHEAD_TOKENS
+            batch, batch_tokens = [], base_tokens
+            for item in items:
+                resume_doc, resume_data, resume_text = item
+                if match_cache is not None:
+                    cached = await asyncio.to_thread(
+                        match_cache.get, match_cache_key(jd_text, resume_text, threshold)
+                    )
+                    if cached is not None:
+                        entry = build_shortlist_entry(resume_doc, job_code, resume_data, cached)
+                        entry["localScore"] = local_scores[entry["resumeId"]]
+                        yield entry
+                        continue
+                tokens = estimate_tokens(resume_text)
+                if batch and (len(batch) >= batch_size or batch_tokens + tokens > MATCH_BATCH_TOKEN_BUDGET):
+                    match_tasks.add(asyncio.create_task(
+                        match_resume_batch(jd_text, batch, job_code, client, semaphore, threshold, match_cache)
+                    ))
+                    batch, batch_tokens = [], base_tokens
+                batch.append(item)
+                batch_tokens += tokens
+            if batch:
+                match_tasks.add(asyncio.create_task(
+                    match_resume_batch(jd_text, batch, job_code, client, semaphore, threshold, match_cache)
+                ))
+        else:
+            match_tasks.update(asyncio.create_task(match_one(item)) for item in items)
+
+        for finished in asyncio.as_completed(match_tasks):
+            for entry in await finished:
+                entry["localScore"] = local_scores.get(entry["resumeId"])
+                yield entry
+    finally:
+        _discard_tasks([*load_tasks, *parse_tasks, *match_tasks])
+
+
+async def iter_match_results(job_code, jd_text, resumes, concurrency=MATCH_CONCURRENCY, threshold=60,
+                             parse_cache=None, match_cache=None, batch_size=MATCH_BATCH_SIZE, mode="full",
+                             required_skills=None, top_k=PREFILTER_TOP_K, min_local_score=PREFILTER_MIN_SCORE,
+                             load_pdf=None):
+    """Match resumes concurrently and yield shortlist entries as they complete.
+
+    With batch_size > 1, resumes that need an LLM match are scored several per
+    request under a shared JD instead of one request each. With mode="prefilter",
+    resumes are ranked locally on their extracted text and only the top_k (at or
+    above min_local_score) are LLM-parsed and matched; the rest are recorded with
+    their local score. With mode="single_pass",
+    each uncached resume is parsed and scored by one request (batch_size is ignored).
+
+    Resumes may be metadata-only documents: load_pdf(resume_doc) is awaited to
+    fetch a PDF when its parse is not cached, so at most `concurrency` PDFs are
+    held in memory at once.
+    """
+    client = get_llm_client()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    if mode == "prefilter":
+        async for entry in _iter_prefiltered_results(
+            job_code, jd_text, resumes, client, semaphore, threshold, batch_size, parse_cache, match_cache,
+            load_pdf, required_skills or [], top_k, min_local_score
+        ):
+            yield entry
+        return
+
+    if batch_size > 1 and mode != "single_pass":
+        async for entry in _iter_batched_results(
+            job_code, jd_text, resumes, client, semaphore, threshold, batch_size, parse_cache, match_cache, load_pdf
+        ):
+            yield entry
+        return
+
+    process = process_resume_single_pass if mode == "single_pass" else process_resume
+    tasks = [
+        asyncio.create_task(process(
+            resume_doc, jd_text, job_code, client, semaphore, threshold, parse_cache, match_cache, load_pdf
+        ))
+        for resume_doc in resumes
+    ]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            entry = await finished
+            if entry is not None:
+                yield entry
+    finally:
+        # Cancel anything still running if the consumer stopped early
+        _discard_tasks(tasks)
@@ -0,0 +1,227 @@
+import os
+import re
+
+from dotenv import load_dotenv
+
+from ranker import normalize_skill, tokenize
+
+load_dotenv()
+
+# Input token targets for the resume part of each prompt
+PARSE_TOKEN_BUDGET = int(os.getenv("PARSE_TOKEN_BUDGET", "1200"))
+RESUME_TOKEN_BUDGET = int(os.getenv("RESUME_TOKEN_BUDGET", "600"))
+JD_TOKEN_BUDGET = int(os.getenv("JD_TOKEN_BUDGET", "400"))
+
+# Lines that carry no information for parsing or matching
+BOILERPLATE_PATTERN = re.compile(
+    r"^(page \d+( of \d+)?|\d+\s*/\s*\d+|curriculum vitae|resume|cv|references? (are )?available( upon| on)? request\.?"
+    r"|i hereby declare.*|declaration:?)$",
+    re.IGNORECASE,
+)
+# Bullet glyphs and separators PDF extraction leaves at the start of a line
+BULLET_PATTERN = re.compile(r"^[\s\-•●▪◦·*>|–—]+")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?;])\s+|\s+[•●▪◦·]\s+")
+
+# Resume section headings and how much they are worth keeping when the text is over budget
+SECTION_PRIORITY = {
+    "experience": 3.0, "employment": 3.0, "work history": 3.0, "internship": 2.5, "skills": 3.0,
+    "technical skills": 3.0, "projects": 2.0, "education": 2.0, "certifications": 1.5, "certificates": 1.5,
+    "courses": 1.0, "achievements": 1.0, "awards": 1.0, "summary": 1.0, "objective": 0.8, "profile": 1.0,
+    "publications": 1.0, "languages": 0.5, "hobbies": 0.2, "interests": 0.2, "references": 0.1, "declaration": 0.1,
+}
+DEFAULT_SECTION_PRIORITY = 1.0
+
+# Achievements shorter than this after cutting are dropped rather than sent as a fragment
+MIN_ACHIEVEMENT_CHARS = 40
+
+# Education is always sent, so each line is capped instead of ranked
+MAX_EDUCATION_CHARS = 200
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token) used for prompt budgeting"""
+    return len(text) // 4 + 1
+
+
+def as_list(value):
+    """A list field of a parsed resume or job: None becomes [], a bare string one item"""
+    if not value:
+        return []
+    if isinstance(value, (str, dict)):
+        return [value]
+    return list(value)
+
+
+def clip(text, max_chars):
+    """Cut text to max_chars, marking the cut with "..." """
+    return text if len(text) <= max_chars else text[:max(0, max_chars - 3)].rstrip() + "..."
+
+
+def clean_line(line):
+    """Strip bullets and collapse runs of whitespace"""
+    return " ".join(BULLET_PATTERN.sub("", line).split())
+
+
+def jd_terms(jd_text):
+    """Distinct JD words used to score relevance, without the labels format_jd_for_llm adds"""
+    labels = {"job", "title", "required", "skills", "experience", "qualifications", "responsibilities", "n", "a"}
+    return {token for token in tokenize(jd_text) if token not in labels and len(token) > 1}
+
+
+def relevance(text, terms):
+    """Share of JD terms that appear in text (0..1)"""
+    if not terms:
+        return 0.0
+    return len(terms & set(tokenize(text))) / len(terms)
+
+
+def _section_priority(heading):
+    lowered = heading.lower().rstrip(":")
+    for name, priority in SECTION_PRIORITY.items():
+        if name in lowered:
+            return priority
+    return DEFAULT_SECTION_PRIORITY
+
+
+def _is_heading(line):
+    """Short line that is all caps or a known section name"""
+    if len(line) > 40 or not any(ch.isalpha() for ch in line):
+        return False
+    letters = [ch for ch in line if ch.isalpha()]
+    return all(ch.isupper() for ch in letters) or line.lower().rstrip(":") in SECTION_PRIORITY
+
+
+def _fit_lines(lines, budget_chars):
+    """Leading lines that fit in budget_chars (one extra char per newline)"""
+    kept = []
+    used = 0
+    for line in lines:
+        if used + len(line) + 1 > budget_chars:
+            break
+        kept.append(line)
+        used += len(line) + 1
+    return kept
+
+
+def compact_resume_text(text, budget_tokens=PARSE_TOKEN_BUDGET):
+    """Fit raw resume text to a token budget for the parse prompts.
+
+    Bullets, whitespace runs, boilerplate lines and repeated lines (page
+    headers/footers) are removed first. If the text is still too long, the
+    lines before the first heading (name and contact details) are always kept
+    and sections are added by priority (experience and skills before hobbies)
+    until the budget is spent, each cut at a line boundary if it does not fit.
+    Sections keep their original order. The result does not depend on any JD,
+    so one cached parse serves every job.
+    """
+    seen = set()
+    lines = []
+    for raw_line in text.splitlines():
+        line = clean_line(raw_line)
+        if not line or BOILERPLATE_PATTERN.match(line) or line.lower() in seen:
+            continue
+        seen.add(line.lower())
+        lines.append(line)
+
+    budget_chars = budget_tokens * 4
+    compacted = "\n".join(lines)
+    if len(compacted) <= budget_chars:
+        return compacted
+
+    sections = [[]]
+    for line in lines:
+        if _is_heading(line) and sections[-1]:
+            sections.append([])
+        sections[-1].append(line)
+
+    header, body = sections[0], sections[1:]
+    if _is_heading(header[0]):
+        header, body = [], sections
+    if not body:
+        # No headings to rank by: keep the start of the text
+        return "\n".join(_fit_lines(lines, budget_chars))
+    header = _fit_lines(header, budget_chars // 4)
+    remaining = budget_chars - sum(len(line) + 1 for line in header)
+
+    ranked = sorted(range(len(body)), key=lambda index: -_section_priority(body[index][0]))
+    chosen = {}
+    for index in ranked:
+        kept = _fit_lines(body[index], remaining)
+        # A heading alone says nothing; skip sections that only fit their title
+        if len(kept) > 1:
+            chosen[index] = kept
+            remaining -= sum(len(line) + 1 for line in kept)
+    return "\n".join(header + [line for index in sorted(chosen) for line in chosen[index]])
+
+
+def dedupe_skills(skills):
+    """Split "Languages: Python, C++" style entries and drop case/spacing duplicates, keeping first spelling"""
+    result = {}
+    for entry in as_list(skills):
+        entry = str(entry)
+        if ":" in entry:
+            entry = entry.split(":", 1)[1]
+        for skill in re.split(r"[,;|]\s*(?![^()]*\))", entry):
+            skill = clean_line(skill).strip(" .")
+            key = normalize_skill(skill)
+            if key and key not in result:
+                result[key] = skill
+    return list(result.values())
+
+
+def compress_text(text, terms=None, budget_chars=None):
+    """Collapse whitespace and duplicate sentences; over budget, keep the most JD-relevant sentences in order"""
+    sentences = []
+    seen = set()
+    for sentence in SENTENCE_PATTERN.split(str(text)):
+        sentence = clean_line(sentence)
+        if sentence and sentence.lower() not in seen:
+            seen.add(sentence.lower())
+            sentences.append(sentence)
+    compressed = " ".join(sentences)
+    if budget_chars is None or len(compressed) <= budget_chars:
+        return compressed
+
+    ranked = sorted(range(len(sentences)), key=lambda index: -relevance(sentences[index], terms or set()))
+    chosen = set()
+    used = 0
+    for index in ranked:
+        if used + len(sentences[index]) + 1 <= budget_chars:
+            chosen.add(index)
+            used += len(sentences[index]) + 1
+    if not chosen:
+        return clip(sentences[0], budget_chars)
+    return " ".join(sentences[index] for index in sorted(chosen))
+
+
+def _present(value):
+    return value not in (None, "", "N/A", [], {})
+
+
+def format_experience(exp, terms, budget_chars=None):
+    """One "- Position at Company (years): achievements" line with compressed achievements"""
+    if not isinstance(exp, dict):
+        return f"- {compress_text(exp, terms, budget_chars)}"
+    role = " at ".join(str(exp[key]) for key in ("Position", "Company Name") if _present(exp.get(key))) or "N/A"
+    if _present(exp.get("Years Worked")):
+        role += f" ({exp['Years Worked']})"
+    achievements = exp.get("Achievements")
+    if not _present(achievements):
+        return f"- {role}"
+    if isinstance(achievements, list):
+        achievements = ". ".join(str(item) for item in achievements)
+    room = None if budget_chars is None else budget_chars - len(role) - 4
+    if room is not None and room < MIN_ACHIEVEMENT_CHARS:
+        return f"- {role}"
+    compressed = compress_text(achievements, terms, room)
+    return f"- {role}: {compressed}" if compressed else f"- {role}"
+
+
+def format_education(edu):
+    """One "- Degree in Field (years)" line, capped at MAX_EDUCATION_CHARS"""
+    if not isinstance(edu, dict):
+        return f"- {clip(clean_line(str(edu)), MAX_EDUCATION_CHARS)}"
+    line = " in ".join(str(edu[key]) for key in ("Degree", "Fields of Study") if _present(edu.get(key))) or "N/A"
+    if _present(edu.get("Years Attended")):
+        line += f" ({edu['Years Attended']})"
+    return f"- {clip(clean_line(line), MAX_EDUCATION_CHARS)}"
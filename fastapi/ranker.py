@@ -0,0 +1,102 @@
+import os
+import re
+from collections import Counter
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Pre-filter defaults: how many candidates reach the LLM, and the local score they must reach
+PREFILTER_TOP_K = int(os.getenv("PREFILTER_TOP_K", "20"))
+PREFILTER_MIN_SCORE = float(os.getenv("PREFILTER_MIN_SCORE", "0.0"))
+
+# Weights of the two local signals in the combined score
+SKILL_WEIGHT = 0.6
+BM25_WEIGHT = 0.4
+
+# Standard BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Keeps tokens like "c++", "c#" and "node.js" intact
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+
+
+def tokenize(text):
+    """Lowercase word tokens, with trailing punctuation dots stripped"""
+    return [token.rstrip(".") for token in TOKEN_PATTERN.findall((text or "").lower())]
+
+
+def normalize_skill(skill):
+    """Canonical form of a skill for set comparison"""
+    return " ".join(tokenize(str(skill)))
+
+
+def skill_overlap_scores(required_skills, candidate_skills, candidate_texts):
+    """Fraction of required skills each candidate covers, as a (candidates,) array.
+
+    A required skill counts as covered when it is one of the candidate's parsed
+    skills or all of its words appear in the candidate's raw text.
+    """
+    required = [skill for skill in dict.fromkeys(normalize_skill(s) for s in required_skills) if skill]
+    if not required:
+        return np.zeros(len(candidate_skills))
+
+    covered = np.zeros((len(candidate_skills), len(required)), dtype=bool)
+    for row, (skills, text) in enumerate(zip(candidate_skills, candidate_texts)):
+        skill_set = {normalize_skill(skill) for skill in skills or []}
+        token_set = set(tokenize(text))
+        for col, skill in enumerate(required):
+            covered[row, col] = skill in skill_set or all(word in token_set for word in skill.split())
+    return covered.mean(axis=1)
+
+
+def bm25_scores(query_text, documents):
+    """BM25 score of every document against the query terms, as a (documents,) array"""
+    query_terms = list(dict.fromkeys(tokenize(query_text)))
+    if not query_terms or not documents:
+        return np.zeros(len(documents))
+
+    term_index = {term: col for col, term in enumerate(query_terms)}
+    tf = np.zeros((len(documents), len(query_terms)))
+    lengths = np.zeros(len(documents))
+    for row, document in enumerate(documents):
+        tokens = tokenize(document)
+        lengths[row] = len(tokens)
+        for term, count in Counter(tokens).items():
+            col = term_index.get(term)
+            if col is not None:
+                tf[row, col] = count
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((len(documents) - df + 0.5) / (df + 0.5))
+    avg_length = lengths.mean() or 1.0
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_length)
+    weighted = tf * (BM25_K1 + 1) / (tf + norm[:, None])
+    return weighted @ idf
+
+
+def rank_candidates(required_skills, jd_text, resume_datas):
+    """Combined local relevance score in [0, 1] for each parsed resume"""
+    if not resume_datas:
+        return np.zeros(0)
+
+    texts = [resume_data.get("Raw Text") or "" for resume_data in resume_datas]
+    skills = [resume_data.get("Skills") or [] for resume_data in resume_datas]
+
+    bm25 = bm25_scores(jd_text, texts)
+    if bm25.max() > 0:
+        bm25 = bm25 / bm25.max()
+
+    if not required_skills:
+        return bm25
+    overlap = skill_overlap_scores(required_skills, skills, texts)
+    return SKILL_WEIGHT * overlap + BM25_WEIGHT * bm25
+
+
+def select_top_candidates(scores, top_k=PREFILTER_TOP_K, min_score=PREFILTER_MIN_SCORE):
+    """Indices of candidates at or above min_score, best first, capped at top_k"""
+    order = np.argsort(-scores, kind="stable")
+    order = order[scores[order] >= min_score]
+    return order[:top_k].tolist()
@@ -0,0 +1,172 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Request rate allowed towards the LLM backend (requests/second) and burst size
+LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "10"))
+LLM_BURST = int(os.getenv("LLM_BURST", "10"))
+
+# Retries with full-jitter exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+
+# Send a duplicate request if the first has not answered after this many seconds (0 disables hedging)
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "0"))
+
+# Circuit breaker: consecutive failures that open it, how long it stays open, and how long
+# callers wait for it to close before giving up on the run
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+CIRCUIT_MAX_PAUSE = float(os.getenv("CIRCUIT_MAX_PAUSE", "120"))
+
+
+def backoff_delay(attempt, retry_after=None, base=LLM_BACKOFF_BASE, cap=LLM_BACKOFF_MAX):
+    """Full-jitter exponential backoff, never shorter than a server-provided Retry-After"""
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return delay
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header (the delta-seconds form), or None"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """Token bucket whose refill rate backs off on 429s and recovers on successes (AIMD)"""
+
+    def __init__(self, rate=LLM_RATE_LIMIT, burst=LLM_BURST, min_rate=0.2):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _try_take(self):
+        """Take a token if one is available; otherwise return how long to wait"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        """Wait until a request may be sent"""
+        while True:
+            wait = self._try_take()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self):
+        """Blocking variant of acquire for sync callers"""
+        while True:
+            wait = self._try_take()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def on_throttled(self, retry_after=None):
+        """Halve the rate and, if the server said so, hold every caller until Retry-After"""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def on_success(self):
+        """Creep the rate back towards the configured maximum"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 50)
+
+
+class CircuitOpenError(Exception):
+    """The LLM backend kept failing; the run should stop rather than record bogus results"""
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; after a cool-down one probe call decides whether it closes again"""
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS,
+                 max_pause=CIRCUIT_MAX_PAUSE):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.max_pause = max_pause
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def _remaining_open(self):
+        """Seconds until this caller may send (0 when it may, including as the half-open probe)"""
+        with self._lock:
+            if self.state == "closed":
+                return 0.0
+            now = time.monotonic()
+            if self.state == "open":
+                remaining = self.opened_at + self.reset_seconds - now
+                if remaining > 0:
+                    return remaining
+                # This caller is the probe; everyone else waits for its outcome
+                self.state = "half_open"
+                self.probe_started = now
+                return 0.0
+            remaining = self.probe_started + self.reset_seconds - now
+            if remaining <= 0:
+                # The probe never reported back (e.g. it was cancelled): let another caller try
+                self.probe_started = now
+                return 0.0
+            return remaining
+
+    async def wait_until_closed(self):
+        """Pause while the circuit is open; raise CircuitOpenError after max_pause seconds"""
+        waited = 0.0
+        while True:
+            remaining = self._remaining_open()
+            if remaining <= 0:
+                return
+            if waited >= self.max_pause:
+                raise CircuitOpenError(f"LLM circuit breaker open after {self.failures} consecutive failures")
+            step = min(remaining, self.max_pause - waited, 1.0)
+            await asyncio.sleep(step)
+            waited += step
+
+    def check_sync(self):
+        """Sync callers do not wait: fail fast while the circuit is open"""
+        if self._remaining_open() > 0:
+            raise CircuitOpenError(f"LLM circuit breaker open after {self.failures} consecutive failures")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = "closed"
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+                print(f"⚠️  WARNING: LLM circuit breaker opened after {self.failures} consecutive failures")
@@ -0,0 +1,88 @@
+import hashlib
+import os
+
+from dotenv import load_dotenv
+from gridfs import GridFSBucket
+
+load_dotenv()
+
+# GridFS bucket holding resume PDFs (collections resumeFiles.files / resumeFiles.chunks)
+RESUME_BUCKET = "resumeFiles"
+
+# Resume fields the matcher needs up front; the PDF itself is fetched on demand
+RESUME_METADATA_PROJECTION = {"fileData": 0}
+
+
+def pdf_sha256(data):
+    """Plain SHA-256 hex digest of PDF bytes, the same value the Node upload route stores as contentHash"""
+    return hashlib.sha256(bytes(data)).hexdigest()
+
+
+def resume_metadata_query(job_code):
+    """Resumes of a job that have a file, either in GridFS or inline (not yet migrated)"""
+    return {
+        "jobCode": job_code,
+        "$or": [{"fileId": {"$exists": True}}, {"fileData": {"$exists": True}}],
+    }
+
+
+def store_resume_pdf(db, data, filename=None, content_type="application/pdf"):
+    """Store PDF bytes in GridFS once per distinct content; returns (file_id, content_hash)"""
+    digest = pdf_sha256(data)
+    existing = db[f"{RESUME_BUCKET}.files"].find_one({"metadata.contentHash": digest}, {"_id": 1})
+    if existing is not None:
+        return existing["_id"], digest
+    bucket = GridFSBucket(db, bucket_name=RESUME_BUCKET)
+    file_id = bucket.upload_from_stream(
+        filename or f"{digest}.pdf", bytes(data), metadata={"contentHash": digest, "contentType": content_type}
+    )
+    return file_id, digest
+
+
+def read_resume_pdf(db, resume_doc):
+    """PDF bytes for a resume metadata document, from GridFS or the legacy inline fileData"""
+    if resume_doc.get("fileId"):
+        with GridFSBucket(db, bucket_name=RESUME_BUCKET).open_download_stream(resume_doc["fileId"]) as stream:
+            return stream.read()
+    doc = db["resumes"].find_one({"_id": resume_doc["_id"]}, {"fileData": 1})
+    data = doc.get("fileData") if doc else None
+    return bytes(data) if data else None
+
+
+def migrate_resumes_to_gridfs(db):
+    """Move inline fileData of every resume into GridFS, one document at a time.
+
+    Safe to re-run: documents that already have a fileId are skipped, and
+    identical PDFs share one GridFS file. Returns the number migrated.
+    """
+    resumes = db["resumes"]
+    pending = [doc["_id"] for doc in resumes.find(
+        {"fileData": {"$exists": True}, "fileId": {"$exists": False}}, {"_id": 1}
+    )]
+    print(f"🔄 Migrating {len(pending)} resumes to GridFS...")
+    migrated = 0
+    for resume_id in pending:
+        doc = resumes.find_one({"_id": resume_id}, {"fileData": 1, "filename": 1, "contentType": 1})
+        if not doc or not doc.get("fileData"):
+            continue
+        file_id, digest = store_resume_pdf(
+            db, doc["fileData"], doc.get("filename"), doc.get("contentType") or "application/pdf"
+        )
+        resumes.update_one({"_id": resume_id}, {
+            "$set": {"fileId": file_id, "contentHash": digest, "fileSize": len(doc["fileData"])},
+            "$unset": {"fileData": ""},
+        })
+        migrated += 1
+        if migrated % 100 == 0:
+            print(f"🔄 Migrated {migrated}/{len(pending)} resumes")
+    print(f"✅ Migrated {migrated} resumes to GridFS")
+    return migrated
+
+
+if __name__ == "__main__":
+    from pymongo import MongoClient
+
+    mongo_url = os.getenv("MONGO_URL")
+    if not mongo_url:
+        raise SystemExit("❌ MONGO_URL is not set")
+    migrate_resumes_to_gridfs(MongoClient(mongo_url)["test"])
@@ -0,0 +1,229 @@
+import asyncio
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Number of match runs processed at the same time
+MATCH_WORKERS = int(os.getenv("MATCH_WORKERS", "2"))
+
+# Finished runs kept around for polling before the oldest are forgotten
+MAX_FINISHED_RUNS = int(os.getenv("MAX_FINISHED_RUNS", "200"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class MatchRun:
+    """State and progress counters of one queued match run"""
+
+    def __init__(self, job_code, options):
+        self.id = uuid.uuid4().hex
+        self.job_code = job_code
+        self.options = options
+        self.status = "queued"
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.shortlisted = 0
+        self.error = None
+        # {resume_id: {stage: seconds}} when the run was submitted with trace=true
+        self.trace = {} if options.get("trace") else None
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_requested = False
+        self.task = None
+        self._started = None
+        self._finished = None
+
+    def record(self, entry):
+        """Count one finished shortlist entry"""
+        self.done += 1
+        if entry.get("candidateName") == "Processing Failed":
+            self.failed += 1
+        if entry.get("shortlist"):
+            self.shortlisted += 1
+
+    def to_dict(self):
+        """JSON-friendly progress snapshot"""
+        elapsed = None
+        throughput = None
+        if self._started is not None:
+            end = self._finished if self.finished_at else time.perf_counter()
+            elapsed = round(end - self._started, 3)
+            throughput = round(self.done / elapsed, 3) if elapsed > 0 else None
+        return {
+            "runId": self.id,
+            "jobCode": self.job_code,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "shortlisted": self.shortlisted,
+            "elapsedSeconds": elapsed,
+            "resumesPerSecond": throughput,
+            "error": self.error,
+            "options": self.options,
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at,
+        }
+
+
+class MatchGuard:
+    """Per-job locks plus a global limit on how many match runs execute at once.
+
+    Every way of starting a match (queued runs, wait=true, streaming,
+    auto-matching) holds the guard while it runs, so one job is never matched
+    twice at the same time and later callers find the caches already warm.
+    """
+
+    def __init__(self, limit=MATCH_WORKERS):
+        self.limit = max(1, limit)
+        self._locks = {}
+        self._waiters = {}
+        self._semaphore = None
+
+    @asynccontextmanager
+    async def hold(self, job_code):
+        """Wait for job_code to be free and for a global slot, then hold both"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        lock = self._locks.setdefault(job_code, asyncio.Lock())
+        self._waiters[job_code] = self._waiters.get(job_code, 0) + 1
+        try:
+            # The job lock comes first so a run waiting on its job does not take a global slot
+            async with lock, self._semaphore:
+                yield
+        finally:
+            self._waiters[job_code] -= 1
+            if not self._waiters[job_code]:
+                del self._waiters[job_code]
+                del self._locks[job_code]
+
+
+class MatchRunQueue:
+    """In-process queue of match runs served by a fixed pool of worker tasks.
+
+    ``executor(run)`` does the actual matching and is expected to update the
+    run's counters through ``run.record``. At most one queued or running run
+    exists per job code; submitting again returns that run.
+    """
+
+    def __init__(self, executor, workers=MATCH_WORKERS):
+        self.executor = executor
+        self.workers = workers
+        self.runs = {}
+        self._active_by_job = {}
+        self._queue = None
+        self._worker_tasks = []
+
+    @property
+    def live_workers(self):
+        """Worker tasks currently alive"""
+        return sum(1 for task in self._worker_tasks if not task.done())
+
+    def start(self):
+        """Spawn the worker tasks; call from a running event loop"""
+        if self._worker_tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(max(1, self.workers))]
+
+    async def stop(self):
+        """Cancel queued and running runs and stop the workers"""
+        for run in self.runs.values():
+            if run.status in ACTIVE_STATUSES:
+                self.cancel(run.id)
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def submit(self, job_code, options):
+        """Queue a run for job_code, or return the one already in progress.
+
+        Returns (run, created).
+        """
+        existing = self.runs.get(self._active_by_job.get(job_code))
+        if existing is not None and existing.status in ACTIVE_STATUSES:
+            return existing, False
+
+        if not self._worker_tasks:
+            self.start()
+        run = MatchRun(job_code, options)
+        self.runs[run.id] = run
+        self._active_by_job[job_code] = run.id
+        self._queue.put_nowait(run)
+        self._forget_old_runs()
+        return run, True
+
+    def get(self, run_id):
+        """Look up a run by id"""
+        return self.runs.get(run_id)
+
+    def list(self, job_code=None):
+        """Runs, newest first, optionally for one job code"""
+        runs = [run for run in self.runs.values() if job_code is None or run.job_code == job_code]
+        return sorted(runs, key=lambda run: run.created_at, reverse=True)
+
+    def cancel(self, run_id):
+        """Cancel a queued or running run; returns the run or None if unknown"""
+        run = self.runs.get(run_id)
+        if run is None or run.status not in ACTIVE_STATUSES:
+            return run
+        run.cancel_requested = True
+        if run.task is not None:
+            run.task.cancel()
+        else:
+            self._finish(run, "cancelled")
+        return run
+
+    def _finish(self, run, status, error=None):
+        run.status = status
+        run.error = error
+        run.finished_at = datetime.utcnow()
+        run._finished = time.perf_counter()
+        if self._active_by_job.get(run.job_code) == run.id:
+            del self._active_by_job[run.job_code]
+
+    def _forget_old_runs(self):
+        finished = [run for run in self.runs.values() if run.status not in ACTIVE_STATUSES]
+        finished.sort(key=lambda run: run.created_at)
+        for run in finished[:max(0, len(finished) - MAX_FINISHED_RUNS)]:
+            del self.runs[run.id]
+
+    async def _worker(self):
+        while True:
+            run = await self._queue.get()
+            try:
+                if run.cancel_requested:
+                    continue
+                await self._execute(run)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, run):
+        run.status = "running"
+        run.started_at = datetime.utcnow()
+        run._started = time.perf_counter()
+        run.task = asyncio.create_task(self.executor(run))
+        try:
+            await run.task
+        except asyncio.CancelledError:
+            self._finish(run, "cancelled")
+            # Only swallow the cancellation if it targeted the run, not the worker itself
+            if asyncio.current_task().cancelling():
+                raise
+        except Exception as e:
+            print(f"❌ Match run {run.id} for {run.job_code} failed: {e}")
+            self._finish(run, "failed", error=str(e))
+        else:
+            self._finish(run, "completed")
+        finally:
+            run.task = None
@@ -0,0 +1,57 @@
+from match import format_jd_for_llm, format_resume_for_llm
+from parser import parse_cache_key
+from resume_files import pdf_sha256
+
+# Items embedded per EmbeddingIndex.add call while re-indexing a whole collection
+REINDEX_CHUNK = 200
+
+
+def job_index_item(job):
+    """(kind, id, text, fields) for a job description"""
+    return "job", job["jobCode"], format_jd_for_llm(job), {"jobCode": job["jobCode"], "title": job.get("Job Title")}
+
+
+def resume_index_item(resume_doc, parse_cache):
+    """(kind, id, text, fields) for a resume whose parse is cached, or None if it was never parsed"""
+    pdf_hash = resume_doc.get("contentHash")
+    if pdf_hash is None and resume_doc.get("fileData"):
+        pdf_hash = pdf_sha256(resume_doc["fileData"])
+    if pdf_hash is None:
+        return None
+    # Indexing reads what the match run just cached; it must not count as a cache hit
+    resume_data = parse_cache.peek(parse_cache_key(pdf_hash))
+    if resume_data is None:
+        return None
+    contact = resume_data.get("Contact Information", {})
+    return "resume", str(resume_doc["_id"]), format_resume_for_llm(resume_data), {
+        "jobCode": resume_doc.get("jobCode"),
+        "candidateName": resume_data.get("Full Name", "N/A"),
+        "email": contact.get("email", "N/A") if isinstance(contact, dict) else "N/A",
+    }
+
+
+def index_documents(index, parse_cache, jobs=(), resumes=()):
+    """Embed jobs and already-parsed resumes in chunks; returns the number of (re)embedded items"""
+    embedded = 0
+    chunk = [job_index_item(job) for job in jobs]
+    for resume_doc in resumes:
+        item = resume_index_item(resume_doc, parse_cache)
+        if item is not None:
+            chunk.append(item)
+        if len(chunk) >= REINDEX_CHUNK:
+            embedded += index.add(chunk)
+            chunk = []
+    if chunk:
+        embedded += index.add(chunk)
+    return embedded
+
+
+def format_hit(entry, similarity):
+    """API shape of one search result"""
+    return {
+        "resumeId": entry["id"],
+        "jobCode": entry.get("jobCode"),
+        "candidateName": entry.get("candidateName"),
+        "email": entry.get("email"),
+        "similarity": similarity,
+    }
@@ -0,0 +1,170 @@
+import os
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import OperationFailure
+
+load_dotenv()
+
+# Number of shortlist upserts sent per bulk_write round-trip
+SHORTLIST_WRITE_BATCH = int(os.getenv("SHORTLIST_WRITE_BATCH", "50"))
+
+# Page sizes for the list endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+DUPLICATE_KEY_ERROR = 11000
+# Same index key, different options: IndexOptionsConflict / IndexKeySpecsConflict
+INDEX_CONFLICT_ERRORS = (85, 86)
+
+# Rows saved by the Node backend (POST /api/shortlists) carry no resumeId and are left out of the unique index
+MATCHED_ROWS = {"resumeId": {"$exists": True}}
+
+
+def dedupe_shortlists(shortlist_collection):
+    """Delete duplicate (jobCode, resumeId) shortlist rows, keeping the most recent one"""
+    duplicates = shortlist_collection.aggregate([
+        {"$match": MATCHED_ROWS},
+        {"$sort": {"dateShortlisted": DESCENDING}},
+        {"$group": {"_id": {"jobCode": "$jobCode", "resumeId": "$resumeId"}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    removed = 0
+    for group in duplicates:
+        removed += shortlist_collection.delete_many({"_id": {"$in": group["ids"][1:]}}).deleted_count
+    print(f"✅ Removed {removed} duplicate shortlist rows")
+    return removed
+
+
+def ensure_indexes(db):
+    """Create the indexes the matcher and read endpoints rely on"""
+    db["jobs"].create_index("jobCode")
+    db["resumes"].create_index("jobCode")
+    # Content-addressed lookup used when storing resume PDFs in GridFS
+    db["resumeFiles.files"].create_index("metadata.contentHash")
+    shortlist_key = [("jobCode", ASCENDING), ("resumeId", ASCENDING)]
+    try:
+        db["shortlists"].create_index(shortlist_key, unique=True, partialFilterExpression=MATCHED_ROWS)
+    except OperationFailure as e:
+        if e.code in INDEX_CONFLICT_ERRORS:
+            # Built before Node rows were exempt: rebuild it as a partial index
+            db["shortlists"].drop_index(shortlist_key)
+        elif e.code != DUPLICATE_KEY_ERROR:
+            raise
+        # Rows written before upserts existed; clean them up once, then retry
+        dedupe_shortlists(db["shortlists"])
+        db["shortlists"].create_index(shortlist_key, unique=True, partialFilterExpression=MATCHED_ROWS)
+    # Backs /shortlist/{job_code} sorted by score with keyset pagination
+    db["shortlists"].create_index([("jobCode", ASCENDING), ("score", DESCENDING), ("_id", DESCENDING)])
+
+
+def parse_fields(fields, always=("_id",), never=()):
+    """Turn a comma-separated field list into a Mongo inclusion projection (None means all fields)"""
+    if not fields:
+        return {name: 0 for name in never} or None
+    names = [name.strip() for name in fields.split(",") if name.strip() and name.strip() not in never]
+    return {name: 1 for name in [*always, *names]}
+
+
+def _object_id(value):
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise ValueError(f"Invalid cursor: {value}")
+
+
+def find_page_by_id(collection, query, limit, after=None, projection=None):
+    """One page of documents in _id order, starting after the given _id.
+
+    Returns (docs, next_cursor); next_cursor is None on the last page.
+    """
+    if after:
+        query = {**query, "_id": {"$gt": _object_id(after)}}
+    docs = list(collection.find(query, projection).sort("_id", ASCENDING).limit(limit + 1))
+    next_cursor = str(docs[limit - 1]["_id"]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
+def find_page_by_score(collection, query, limit, after=None, projection=None):
+    """One page of shortlist documents ordered by score (then _id), both descending.
+
+    Rows without a numeric score (the Node backend does not require one) come
+    after all scored rows, newest first. The cursor is "<score>_<id>" of the
+    last document on the previous page, "null_<id>" once paging through
+    unscored rows, or "null" when they start on the next page.
+    """
+    scored = {"$and": [query, {"score": {"$type": "number"}}]}
+    unscored = {"$and": [query, {"score": {"$not": {"$type": "number"}}}]}
+    docs = []
+    last_id = None
+    if after is None or not after.startswith("null"):
+        if after:
+            score, _, last_id = after.partition("_")
+            try:
+                score = float(score)
+            except ValueError:
+                raise ValueError(f"Invalid cursor: {after}")
+            last_id = _object_id(last_id)
+            scored["$and"].append({"$or": [
+                {"score": {"$lt": score}},
+                {"score": score, "_id": {"$lt": last_id}},
+            ]})
+            last_id = None
+        docs = list(
+            collection.find(scored, projection)
+            .sort([("score", DESCENDING), ("_id", DESCENDING)])
+            .limit(limit + 1)
+        )
+        if len(docs) > limit:
+            last = docs[limit - 1]
+            return docs[:limit], f"{last['score']}_{last['_id']}"
+    elif after != "null":
+        last_id = _object_id(after[len("null_"):])
+
+    # Scored rows are exhausted: fill the page with unscored ones
+    if last_id is not None:
+        unscored["$and"].append({"_id": {"$lt": last_id}})
+    remaining = limit - len(docs)
+    more = list(collection.find(unscored, projection).sort("_id", DESCENDING).limit(remaining + 1))
+    if remaining == 0:
+        return docs, "null" if more else None
+    next_cursor = f"null_{more[remaining - 1]['_id']}" if len(more) > remaining else None
+    return docs + more[:remaining], next_cursor
+
+
+class ShortlistWriter:
+    """Buffers shortlist entries and writes them as (jobCode, resumeId) upserts in batches"""
+
+    def __init__(self, collection, batch_size=SHORTLIST_WRITE_BATCH):
+        self.collection = collection
+        self.batch_size = batch_size
+        self._buffer = []
+        self.written = 0
+        self.round_trips = 0
+
+    def add(self, entry):
+        """Queue an entry; returns True once the buffer is full and should be flushed"""
+        fields = {key: value for key, value in entry.items() if key != "_id"}
+        # Failed attempts and pre-filtered candidates that never reached the LLM
+        # must not overwrite an earlier result for the same resume
+        if entry.get("candidateName") == "Processing Failed" or entry.get("notSentToLLM"):
+            update = {"$setOnInsert": fields}
+        else:
+            update = {"$set": fields, "$unset": {"notSentToLLM": ""}}
+        self._buffer.append(UpdateOne(
+            {"jobCode": entry["jobCode"], "resumeId": entry["resumeId"]},
+            update,
+            upsert=True,
+        ))
+        return len(self._buffer) >= self.batch_size
+
+    def flush(self):
+        """Send all buffered upserts in one bulk_write"""
+        if not self._buffer:
+            return
+        operations, self._buffer = self._buffer, []
+        self.collection.bulk_write(operations, ordered=False)
+        self.written += len(operations)
+        self.round_trips += 1
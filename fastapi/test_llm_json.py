@@ -0,0 +1,37 @@
+import time
+
+import pytest
+
+from llm_json import extract_json, extract_json_array, extract_json_object
+
+
+def test_plain_object():
+    assert extract_json_object('{"a": 1}') == {"a": 1}
+
+
+def test_object_in_prose_and_code_fence():
+    text = 'Here is the result:\n```json\n{"name": "Ada", "skills": ["Python"]}\n```\nHope this helps.'
+    assert extract_json_object(text) == {"name": "Ada", "skills": ["Python"]}
+
+
+def test_comments_trailing_commas_and_braces_in_strings():
+    text = '{\n  "summary": "uses {braces} and // slashes", // the summary\n  "skills": ["a", "b",],\n}'
+    assert extract_json_object(text) == {"summary": "uses {braces} and // slashes", "skills": ["a", "b"]}
+
+
+def test_skips_invalid_candidate_before_valid_one():
+    assert extract_json_array('See [note 1] for details: [{"score": 70}]') == [{"score": 70}]
+    assert extract_json_object('{ ] then {"a": 1}') == {"a": 1}
+
+
+def test_raises_without_json():
+    with pytest.raises(ValueError):
+        extract_json("no json here")
+
+
+@pytest.mark.parametrize("text", ['{"a": 1 ' * 8000, "{" * 8000, "{]" * 40000])
+def test_unbalanced_input_is_linear(text):
+    started = time.perf_counter()
+    with pytest.raises(ValueError):
+        extract_json_object(text)
+    assert time.perf_counter() - started < 1.0
@@ -0,0 +1,173 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from fake_llm import handle_request
+from llm import FakeBackend, LLMClient, LLMError
+from resilience import AdaptiveRateLimiter, CircuitBreaker, CircuitOpenError
+
+
+class StubBackend(FakeBackend):
+    """Fake backend answered by a custom handler (sync or async)"""
+
+    def __init__(self, handler):
+        super().__init__()
+        self.handler = handler
+
+    def transport(self):
+        return httpx.MockTransport(self.handler)
+
+
+def slow_handler(delay):
+    async def handler(request):
+        await asyncio.sleep(delay)
+        return handle_request(request)
+    return handler
+
+
+def test_open_breaker_lets_exactly_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.3, max_pause=5)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    sent_states = []
+
+    async def caller(succeed):
+        await breaker.wait_until_closed()
+        sent_states.append(breaker.state)
+        await asyncio.sleep(0.1)
+        if succeed:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+    async def run():
+        await asyncio.gather(*(caller(True) for _ in range(10)))
+
+    asyncio.run(run())
+    assert len(sent_states) == 10
+    assert sent_states.count("half_open") == 1
+    assert breaker.state == "closed"
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05, max_pause=5)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.check_sync()
+    assert breaker.state == "half_open"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.times_opened == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.check_sync()
+
+
+def test_limiter_allows_burst_then_paces():
+    limiter = AdaptiveRateLimiter(rate=20, burst=3)
+    assert [limiter._try_take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter._try_take() == pytest.approx(0.05, abs=0.01)
+
+    async def run():
+        started = time.monotonic()
+        for _ in range(4):
+            await limiter.acquire()
+        return time.monotonic() - started
+
+    # Four more tokens at 20/s take about 0.2s
+    assert asyncio.run(run()) >= 0.15
+
+
+def test_limiter_backs_off_on_throttle_and_recovers():
+    limiter = AdaptiveRateLimiter(rate=10, burst=5, min_rate=1)
+    limiter.on_throttled()
+    assert limiter.rate == 5
+    assert limiter._try_take() > 0
+    for _ in range(10):
+        limiter.on_throttled()
+    assert limiter.rate == 1
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.rate == 10
+
+
+def test_limiter_honours_retry_after():
+    limiter = AdaptiveRateLimiter(rate=100, burst=10)
+    limiter.on_throttled(retry_after=0.5)
+    assert limiter._try_take() == pytest.approx(0.5, abs=0.05)
+
+
+def test_hedge_races_a_duplicate_and_counts_it():
+    client = LLMClient(
+        StubBackend(slow_handler(0.4)), hedge_after=0.1, limiter=AdaptiveRateLimiter(rate=100, burst=10)
+    )
+
+    async def run():
+        try:
+            return await client.agenerate("Say hello", "parse")
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run())
+    assert client.counters["requests"] == 2
+    assert client.counters["hedged"] == 1
+
+
+def test_hedge_waits_for_the_rate_limiter():
+    client = LLMClient(
+        StubBackend(slow_handler(0.4)), hedge_after=0.1, limiter=AdaptiveRateLimiter(rate=1, burst=1)
+    )
+
+    async def run():
+        try:
+            return await client.agenerate("Say hello", "parse")
+        finally:
+            await client.aclose()
+
+    # The original answers before the limiter frees a token for the duplicate
+    assert asyncio.run(run())
+    assert client.counters["requests"] == 1
+    assert client.counters["hedged"] == 1
+
+
+def test_fast_response_is_not_hedged():
+    client = LLMClient(StubBackend(handle_request), hedge_after=0.5, limiter=AdaptiveRateLimiter(rate=100, burst=10))
+    assert client.generate("Say hello", "parse")
+    assert asyncio.run(client.agenerate("Say hello", "parse"))
+    assert client.counters["requests"] == 2
+    assert client.counters["hedged"] == 0
+
+
+@pytest.mark.parametrize("status", [400, 401, 403])
+def test_non_retryable_status_is_counted_as_failure(status):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(status, json={"error": "nope"})
+
+    client = LLMClient(StubBackend(handler), hedge_after=0, limiter=AdaptiveRateLimiter(rate=100, burst=10))
+    with pytest.raises(LLMError):
+        client.generate("Say hello", "parse")
+    with pytest.raises(LLMError):
+        asyncio.run(client.agenerate("Say hello", "parse"))
+    assert len(calls) == 2
+    assert client.counters["failures"] == 2
+    assert client.counters["retries"] == 0
+
+
+def test_retryable_status_is_retried_then_counted_once():
+    def handler(request):
+        return httpx.Response(503, json={"error": "overloaded"})
+
+    client = LLMClient(
+        StubBackend(handler), max_retries=2, hedge_after=0,
+        limiter=AdaptiveRateLimiter(rate=100, burst=10), breaker=CircuitBreaker(failure_threshold=10),
+    )
+    with pytest.raises(LLMError):
+        client.generate("Say hello", "parse")
+    assert client.counters["requests"] == 3
+    assert client.counters["retries"] == 2
+    assert client.counters["failures"] == 1
@@ -0,0 +1,221 @@
+import asyncio
+import functools
+import json
+import threading
+import time
+
+import pytest
+
+from runs import MatchGuard, MatchRunQueue
+
+
+class BlockingExecutor:
+    """Executor whose runs wait until released, remembering which jobs it saw"""
+
+    def __init__(self):
+        self.started = []
+        self.release = None
+
+    async def __call__(self, run):
+        if self.release is None:
+            self.release = asyncio.Event()
+        self.started.append(run.job_code)
+        await self.release.wait()
+
+
+async def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.01)
+
+
+def test_one_active_run_per_job():
+    async def scenario():
+        executor = BlockingExecutor()
+        queue = MatchRunQueue(executor, workers=2)
+        first, created = queue.submit("J1", {})
+        assert created
+        again, created = queue.submit("J1", {"mode": "fast"})
+        assert again is first and not created
+        other, created = queue.submit("J2", {})
+        assert created and other is not first
+
+        await wait_for(lambda: first.status == "running")
+        assert queue.submit("J1", {}) == (first, False)
+
+        executor.release.set()
+        await wait_for(lambda: first.status == "completed" and other.status == "completed")
+        rerun, created = queue.submit("J1", {})
+        assert created and rerun is not first
+        await wait_for(lambda: rerun.status == "completed")
+        await queue.stop()
+        assert executor.started.count("J1") == 2
+
+    asyncio.run(scenario())
+
+
+def test_cancel_queued_run_never_executes():
+    async def scenario():
+        executor = BlockingExecutor()
+        queue = MatchRunQueue(executor, workers=1)
+        running, _ = queue.submit("J1", {})
+        queued, _ = queue.submit("J2", {})
+        await wait_for(lambda: running.status == "running")
+
+        assert queue.cancel(queued.id) is queued
+        assert queued.status == "cancelled"
+        executor.release.set()
+        await wait_for(lambda: running.status == "completed")
+        await asyncio.sleep(0.05)
+        assert executor.started == ["J1"]
+        # A new run can be queued for the job once the cancelled one is gone
+        assert queue.submit("J2", {})[1]
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_cancel_running_run_keeps_the_worker():
+    async def scenario():
+        executor = BlockingExecutor()
+        queue = MatchRunQueue(executor, workers=1)
+        run, _ = queue.submit("J1", {})
+        await wait_for(lambda: run.status == "running")
+
+        queue.cancel(run.id)
+        await wait_for(lambda: run.status == "cancelled")
+        assert queue.live_workers == 1
+
+        # The same worker picks up the next run
+        executor.release.set()
+        nxt, _ = queue.submit("J1", {})
+        await wait_for(lambda: nxt.status == "completed")
+        await queue.stop()
+        assert queue.live_workers == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_the_worker_is_not_swallowed():
+    async def scenario():
+        executor = BlockingExecutor()
+        queue = MatchRunQueue(executor, workers=1)
+        run, _ = queue.submit("J1", {})
+        await wait_for(lambda: run.status == "running")
+
+        worker = queue._worker_tasks[0]
+        worker.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await worker
+        assert worker.cancelled()
+        assert run.status == "cancelled"
+
+    asyncio.run(scenario())
+
+
+def test_failed_run_records_error_and_keeps_the_worker():
+    async def executor(run):
+        if run.job_code == "bad":
+            raise RuntimeError("boom")
+        run.record({"candidateName": "Ada", "shortlist": True})
+
+    async def scenario():
+        queue = MatchRunQueue(executor, workers=1)
+        bad, _ = queue.submit("bad", {})
+        good, _ = queue.submit("good", {})
+        await wait_for(lambda: good.status == "completed")
+        assert bad.status == "failed" and bad.error == "boom"
+        assert good.to_dict()["shortlisted"] == 1
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_guard_serialises_one_job_and_limits_overall():
+    guard = MatchGuard(limit=2)
+    active = {"J1": 0, "all": 0}
+    peak = {"J1": 0, "all": 0}
+
+    async def match(job_code):
+        async with guard.hold(job_code):
+            active["all"] += 1
+            peak["all"] = max(peak["all"], active["all"])
+            if job_code == "J1":
+                active["J1"] += 1
+                peak["J1"] = max(peak["J1"], active["J1"])
+            await asyncio.sleep(0.02)
+            if job_code == "J1":
+                active["J1"] -= 1
+            active["all"] -= 1
+
+    async def scenario():
+        await asyncio.gather(*(match("J1") for _ in range(4)), *(match(f"J{i}") for i in range(2, 6)))
+
+    asyncio.run(scenario())
+    assert peak["J1"] == 1
+    assert peak["all"] == 2
+    # Locks are dropped once nobody holds or waits for the job
+    assert guard._locks == {} and guard._waiters == {}
+
+
+def test_every_match_path_on_one_job_shares_the_work(tmp_path, monkeypatch):
+    """Queued run, wait=true, stream and auto-match on one 4-resume job cost 4 parses + 4 matches"""
+    mongomock = pytest.importorskip("mongomock")
+    fitz = pytest.importorskip("fitz")
+    from fastapi.testclient import TestClient
+
+    import auto_match
+    import llm
+    import main
+    import vector_index
+    from fake_llm import FakeLLMTransport
+
+    # mongomock's bulk_write does not accept the sort argument of UpdateOne
+    add_update = mongomock.collection.BulkOperationBuilder.add_update
+    monkeypatch.setattr(mongomock.collection.BulkOperationBuilder, "add_update",
+                        lambda self, *args, sort=None, **kwargs: add_update(self, *args, **kwargs))
+    monkeypatch.setattr(main, "MongoClient", mongomock.MongoClient)
+    monkeypatch.setattr(main, "MONGO_URL", "mongodb://test")
+    monkeypatch.setattr(main, "LLM_BACKEND", "fake")
+    monkeypatch.setattr(llm, "LLM_BACKEND", "fake")
+    monkeypatch.setattr(llm, "_llm_client", None)
+    # Enough latency that the four callers overlap
+    monkeypatch.setattr(llm.FakeBackend, "transport", lambda self: FakeLLMTransport(latency=0.3, seed=1))
+    monkeypatch.setattr(main, "AutoMatcher", functools.partial(auto_match.AutoMatcher, debounce=0.05))
+    monkeypatch.setattr(vector_index, "_embedding_index",
+                        vector_index.EmbeddingIndex(vector_index.get_embedder(), directory=str(tmp_path)))
+
+    def pdf(name, skills):
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), f"{name}\n{name.lower().replace(' ', '.')}@mail.com\nSkills: {skills}")
+        data = doc.tobytes()
+        doc.close()
+        return data
+
+    with TestClient(main.app) as client:
+        main.job_collection.insert_one({"jobCode": "J1", "Job Title": "Dev", "Required Skills": ["Python", "SQL"]})
+        resume_ids = [
+            str(main.resume_collection.insert_one({"jobCode": "J1", "fileData": pdf(f"Cand {i}", skills)}).inserted_id)
+            for i, skills in enumerate(["Python, SQL", "Java", "Python", "Go"])
+        ]
+        for resume_id in resume_ids:
+            client.post(f"/auto-match/resumes/{resume_id}")
+        time.sleep(0.1)
+
+        run = client.post("/match/J1").json()
+        waited = {}
+        waiter = threading.Thread(target=lambda: waited.update(client.post("/match/J1?wait=true").json()))
+        waiter.start()
+        lines = [json.loads(line) for line in client.post("/match/J1/stream").text.splitlines()]
+        waiter.join()
+        deadline = time.monotonic() + 30
+        while client.get(f"/match/runs/{run['runId']}").json()["status"] in ("queued", "running"):
+            assert time.monotonic() < deadline
+            time.sleep(0.1)
+        time.sleep(0.5)
+
+        assert lines[-1]["type"] == "summary"
+        assert waited["total"] == 4
+        assert main.shortlist_collection.count_documents({}) == 4
+        assert llm.get_llm_client().counters["requests"] == 8
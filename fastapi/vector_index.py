@@ -0,0 +1,233 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from dotenv import load_dotenv
+
+from cache import content_hash
+from embeddings import get_embedder
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory file locks (Windows): only one process may write the index
+    fcntl = None
+
+load_dotenv()
+
+# Directory holding the memory-mapped vectors and their metadata
+EMBEDDING_INDEX_DIR = os.getenv("EMBEDDING_INDEX_DIR", "embedding_index")
+
+# Rows reserved up front; the file doubles whenever it fills up
+INITIAL_CAPACITY = 1024
+
+
+class EmbeddingIndex:
+    """Unit-length vectors for resumes and JDs in a memory-mapped float32 matrix.
+
+    Each row has a metadata entry (kind, id, jobCode, display fields and the
+    hash of the embedded text), stored as JSON next to the matrix. Adding an
+    entry whose text is unchanged is a no-op; changed text overwrites its row.
+
+    Several processes (uvicorn workers) can share one directory: writes hold
+    an exclusive lock on index.lock and start from the metadata on disk, and
+    every read reloads the metadata when another process has replaced it.
+    """
+
+    def __init__(self, embedder, directory=EMBEDDING_INDEX_DIR):
+        self.embedder = embedder
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.meta_path = os.path.join(directory, "index.json")
+        self.lock_path = os.path.join(directory, "index.lock")
+        self.entries = []
+        self.rows = {}
+        self.dimensions = None
+        self.capacity = 0
+        self._vectors = None
+        self._kinds = None
+        self._job_codes = None
+        self._lock = threading.Lock()
+        # (mtime_ns, size) of the metadata file this process last read or wrote
+        self._meta_stamp = None
+        self._refresh()
+
+    @staticmethod
+    def key(kind, item_id):
+        return f"{kind}:{item_id}"
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.meta_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self):
+        """(Re)open the index on disk if its metadata changed since this process last saw it.
+
+        An index built by a different embedder is ignored and rebuilt on the next add.
+        """
+        stamp = self._stamp()
+        if stamp is None or stamp == self._meta_stamp or not os.path.exists(self.vectors_path):
+            return
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        self._meta_stamp = stamp
+        if meta.get("embedder") != self.embedder.name or meta.get("model") != self.embedder.model:
+            print(f"⚠️  WARNING: Embedding index was built with {meta.get('embedder')}/{meta.get('model')}, rebuilding")
+            return
+        first_load = self._vectors is None
+        self.entries = meta["entries"]
+        self.rows = {self.key(entry["kind"], entry["id"]): row for row, entry in enumerate(self.entries)}
+        self.dimensions = meta["dimensions"]
+        self.capacity = meta["capacity"]
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                  shape=(self.capacity, self.dimensions))
+        self._kinds = None
+        if first_load:
+            print(f"✅ Loaded embedding index with {len(self.entries)} vectors")
+
+    @contextmanager
+    def _write_lock(self):
+        """Hold the thread lock and, where supported, an exclusive lock shared with other processes"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _ensure_capacity(self, rows, dimensions):
+        """Grow (or create) the backing file so it holds at least `rows` vectors"""
+        if self._vectors is not None and rows <= self.capacity:
+            return
+        capacity = max(INITIAL_CAPACITY, self.capacity)
+        while capacity < rows:
+            capacity *= 2
+        os.makedirs(self.directory, exist_ok=True)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        else:
+            # Fresh index: drop any vectors left by an incompatible embedder
+            self.dimensions = dimensions
+            open(self.vectors_path, "wb").close()
+        with open(self.vectors_path, "r+b") as f:
+            f.truncate(capacity * self.dimensions * 4)
+        self.capacity = capacity
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                  shape=(self.capacity, self.dimensions))
+
+    def _save_meta(self):
+        meta = {
+            "embedder": self.embedder.name,
+            "model": self.embedder.model,
+            "dimensions": self.dimensions,
+            "capacity": self.capacity,
+            "entries": self.entries,
+        }
+        tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+        self._meta_stamp = self._stamp()
+
+    def add(self, items):
+        """Embed and store (kind, id, text, fields) items; returns how many rows were (re)embedded"""
+        with self._lock:
+            self._refresh()
+            changed = []
+            for kind, item_id, text, fields in items:
+                text_hash = content_hash(text)
+                row = self.rows.get(self.key(kind, item_id))
+                if row is not None and self.entries[row]["textHash"] == text_hash:
+                    continue
+                changed.append(({"kind": kind, "id": item_id, "textHash": text_hash, **fields}, text))
+        if not changed:
+            return 0
+
+        # Embedding may be a remote call, so it runs before taking the lock
+        vectors = self.embedder.embed([text for _, text in changed])
+        with self._write_lock():
+            # Rows other processes added while we were embedding
+            self._refresh()
+            new_rows = sum(1 for entry, _ in changed if self.key(entry["kind"], entry["id"]) not in self.rows)
+            self._ensure_capacity(len(self.entries) + new_rows, vectors.shape[1])
+            for (entry, _), vector in zip(changed, vectors):
+                key = self.key(entry["kind"], entry["id"])
+                row = self.rows.get(key)
+                if row is None:
+                    row = len(self.entries)
+                    self.entries.append(entry)
+                    self.rows[key] = row
+                else:
+                    self.entries[row] = entry
+                self._vectors[row] = vector
+            self._vectors.flush()
+            self._kinds = None
+            self._save_meta()
+        return len(changed)
+
+    def vector(self, kind, item_id):
+        """Stored vector for an item, or None if it is not indexed"""
+        with self._lock:
+            self._refresh()
+            row = self.rows.get(self.key(kind, item_id))
+            return None if row is None else np.array(self._vectors[row])
+
+    def search(self, query_vector, kind="resume", k=10, exclude=None, exclude_job=None):
+        """Top-k entries of one kind by cosine similarity; returns (entry, similarity) pairs.
+
+        `exclude` is one (kind, id) to leave out; `exclude_job` leaves out every entry of that jobCode.
+        """
+        with self._lock:
+            self._refresh()
+            count = len(self.entries)
+            if count == 0 or self._vectors is None:
+                return []
+            if self._kinds is None:
+                self._kinds = np.array([entry["kind"] for entry in self.entries])
+                self._job_codes = np.array([str(entry.get("jobCode")) for entry in self.entries])
+            scores = self._vectors[:count] @ np.asarray(query_vector, dtype=np.float32)
+            scores[self._kinds != kind] = -np.inf
+            if exclude is not None and self.key(*exclude) in self.rows:
+                scores[self.rows[self.key(*exclude)]] = -np.inf
+            if exclude_job is not None:
+                scores[self._job_codes == str(exclude_job)] = -np.inf
+
+            k = min(k, count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self.entries[row], round(float(scores[row]), 4)) for row in top if np.isfinite(scores[row])]
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            kinds = [entry["kind"] for entry in self.entries]
+        return {
+            "embedder": self.embedder.name,
+            "model": self.embedder.model,
+            "dimensions": self.dimensions,
+            "resumes": kinds.count("resume"),
+            "jobs": kinds.count("job"),
+            "capacity": self.capacity,
+        }
+
+
+_embedding_index = None
+
+
+def get_embedding_index():
+    """Return the process-wide embedding index, opening it on first use"""
+    global _embedding_index
+    if _embedding_index is None:
+        _embedding_index = EmbeddingIndex(get_embedder())
+    return _embedding_index
@@ -70,8 +70,16 @@ function SmartMatchPage() {
       // Step 1: Trigger the matching process
       const matchResponse = await axios.post(`https://smart-match-ai.onrender.com/match/${selectedCode}`);
 
-// Wait 3 seconds before fetching results
-await new Promise(resolve => setTimeout(resolve, 3000));
+// Matching runs in the background; poll the run until it finishes
+let run = matchResponse.data;
+while (run.status === "queued" || run.status === "running") {
+  await new Promise(resolve => setTimeout(resolve, 3000));
+  const runResponse = await axios.get(`https://smart-match-ai.onrender.com/match/runs/${run.runId}`);
+  run = runResponse.data;
+}
+if (run.status === "failed" || run.status === "cancelled") {
+  throw new Error(run.error || `Match run ${run.status}`);
+}
 
 const shortlistResponse = await axios.get(
   `https://smart-match-ai-node.onrender.com/api/shortlists?code=${selectedCode}` );